@@ -0,0 +1,3 @@
+from anobbs_cli.main import main
+
+main()
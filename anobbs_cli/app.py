@@ -1,15 +1,113 @@
 import json
 import logging
+import sys
 import time
+from typing import AnyStr, List, Optional, TYPE_CHECKING
 
 import click
 
 from anobbs_cli import AppConstant
-from anobbs_cli.lib import ano_bbs_client
-from imcli import VerticalLayout, Text, AnyStr
+from anobbs_cli.lib import AnoBbsClient, AnoBbsError, CompletionCache, all_clients, get_client
+from anobbs_cli.output import OutputFormat, write_json, write_ndjson, write_records
+
+if TYPE_CHECKING:
+    from imcli import BaseUiObject, RenderCache
 
 logger = logging.getLogger(__name__)
 
+PAGE_FIELDS = ["id", "first_floor.no", "owner_ac", "update_date", "floor_count", "first_floor.content"]
+FLOOR_FIELDS = ["no", "owner_ac", "create_date", "content"]
+CODE_FIELDS = ["kind", "id", "is_blocked", "is_used"]
+BULK_FIELDS = ["index", "kind", "status", "page_id", "result", "error", "attempts", "latency"]
+ACCOUNT_FIELDS = ["id", "parent", "depth", "children", "descendants"]
+
+
+def client() -> AnoBbsClient:
+    # Only the commands talking to the server build the client
+    ctx = click.get_current_context(silent=True)
+    root = ctx.find_root() if ctx is not None else None
+    options = root.obj if root is not None and root.obj else {}
+    profile = options.get("profile")
+    if "profile" not in options and root is not None:
+        # Shell completion parses the options without running the group, the profile is only in its params
+        profile = root.params.get("profile")
+    try:
+        ano_bbs_client = get_client(profile=profile)
+    except RuntimeError as err:
+        logging.warning(f"Please edit config file: {AnoBbsClient.DEFAULT_CONFIG_PATH}")
+        logging.error(err)
+        sys.exit(1)
+    ano_bbs_client.offline = options.get("offline", False)
+    return ano_bbs_client
+
+
+def output_format() -> AnyStr:
+    ctx = click.get_current_context(silent=True)
+    if ctx is not None and ctx.find_root().obj:
+        return ctx.find_root().obj.get("format", OutputFormat.TEXT)
+    return OutputFormat.TEXT
+
+
+def flush_client(started_at: float = 0.0, started_time: Optional[float] = None) -> None:
+    # `started_at` is the command's time.monotonic(), `started_time` its time.time()
+    for ano_bbs_client in all_clients():
+        journal = ano_bbs_client.journal
+        if (
+                (ano_bbs_client.last_answer_at or 0.0) > started_at
+                and (journal.replayed_at or 0.0) < started_at
+                and not ano_bbs_client.offline
+                and journal.has_pending()
+        ):
+            # The server answered this command, the writes queued while it was away go now. The ones
+            # this command journaled or tried itself are left to `anobbs flush`: they had their attempts
+            # and a bulk run skipped some on purpose to keep a thread in order
+            from anobbs_cli.lib.journal import replay_journal
+
+            try:
+                stats = replay_journal(
+                    ano_bbs_client,
+                    journal,
+                    before=started_time,
+                    exclude=journal.touched_since(started_at),
+                )
+                if stats.sent or stats.failed or stats.unknown or stats.pending:
+                    logger.info(f"Queued writes: {stats}")
+            except Exception as err:
+                logger.error(f"Queued writes not sent: {err}")
+        ano_bbs_client.flush_config()
+    if _render_cache is not None:
+        _render_cache.close()
+
+
+_render_cache: Optional["RenderCache"] = None
+
+
+def render_cache() -> "RenderCache":
+    global _render_cache
+    if _render_cache is None:
+        from imcli import RenderCache
+
+        on_disk = client().config_value(AnoBbsClient.ConfigKeys.UI_RENDER_CACHE_ON_DISK)
+        _render_cache = RenderCache(path=str(AnoBbsClient.DEFAULT_RENDER_CACHE_PATH) if on_disk else None)
+    return _render_cache
+
+
+def text_key(kind: AnyStr, item_id, content: AnyStr, text_kwargs: dict) -> AnyStr:
+    return render_cache().make_key(kind, item_id, content, sorted(text_kwargs.items()))
+
+
+def cached_text(kind: AnyStr, item_id, content: AnyStr, **text_kwargs) -> "BaseUiObject":
+    # Posted content never changes, so a card is rendered once per content and layout
+    from imcli import Text
+
+    return render_cache().render(text_key(kind, item_id, content, text_kwargs), lambda: Text(content, **text_kwargs))
+
+
+def cached_texts(text_args: List[tuple]) -> List["BaseUiObject"]:
+    # (kind, item_id, content, text_kwargs) per card, the on-disk renders are read in one query
+    render_cache().preload([text_key(*args) for args in text_args])
+    return [cached_text(kind, item_id, content, **text_kwargs) for kind, item_id, content, text_kwargs in text_args]
+
 
 def format_time(timestamp: float) -> AnyStr:
     return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
@@ -26,48 +124,87 @@ def print_version(ctx, _, value):
 
 
 def set_debug_level(debug: str) -> None:
-    logging.basicConfig(level=logging.DEBUG if debug else logging.INFO,
+    level = logging.DEBUG if debug else logging.INFO
+    logging.basicConfig(level=level,
                         format='%(asctime)s %(name)s %(levelname)s: %(message)s')
+    # basicConfig does nothing once logging is set up, a daemon sets the level again for every command
+    logging.getLogger().setLevel(level)
+
+
+def echo_lines(ui: "BaseUiObject") -> None:
+    # Lines go out as soon as they are rendered, `anobbs pages | less` shows up immediately
+    write = sys.stdout.write
+    for line in ui.render_lines():
+        write(line + "\n")
+    sys.stdout.flush()
 
 
-def create_floor_text(floor_data: dict) -> Text:
-    return Text(
+def floor_text_args(floor_data: dict, use_line_border: bool) -> tuple:
+    return (
+        "floor",
+        floor_data.get('no'),
         f"No.{floor_data.get('no')}\n"
         f"Owner: {floor_data.get('owner_ac')}\n"
         f"Date: {format_time(floor_data.get('create_date'))}\n"
         f"\n"
         f"\t{floor_data.get('content')}\n",
-        64,
-        lr_padding=0,
-        lr_margin=4,
-        use_line_border=ano_bbs_client.config[ano_bbs_client.ConfigKeys.UI_USE_LINE_BORDER]
+        dict(
+            max_lenght=64,
+            lr_padding=0,
+            lr_margin=4,
+            use_line_border=use_line_border
+        ),
+    )
+
+
+def page_text_args(page_data: dict, use_line_border: bool) -> tuple:
+    return (
+        "page",
+        page_data.get('id'),
+        f"No: {page_data.get('first_floor', {}).get('no')}\n"
+        f"ID: {page_data.get('id')}\n"
+        f"Owner: {page_data.get('owner_ac')}\n"
+        f"Date: {format_time(page_data.get('update_date'))}\n"
+        f"Count: {page_data.get('floor_count')}\n"
+        f"Topic: {page_data.get('first_floor', {}).get('content')}\n\n",
+        dict(
+            max_lenght=64,
+            min_lenght=0,
+            lr_padding=1,
+            lr_margin=4,
+            use_line_border=use_line_border
+        ),
     )
 
 
-def cli_query_group(page_size=50, page_index=1) -> bool:
-    res = ano_bbs_client.query_group_with_pages(
+def create_floor_text(floor_data: dict, use_line_border: Optional[bool] = None) -> "BaseUiObject":
+    return create_floor_texts([floor_data], use_line_border)[0]
+
+
+def create_floor_texts(floors: List[dict], use_line_border: Optional[bool] = None) -> List["BaseUiObject"]:
+    if use_line_border is None:
+        use_line_border = client().config_value(AnoBbsClient.ConfigKeys.UI_USE_LINE_BORDER)
+    return cached_texts([floor_text_args(floor, use_line_border) for floor in floors])
+
+
+def create_page_texts(pages: List[dict], use_line_border: Optional[bool] = None) -> List["BaseUiObject"]:
+    if use_line_border is None:
+        use_line_border = client().config_value(AnoBbsClient.ConfigKeys.UI_USE_LINE_BORDER)
+    return cached_texts([page_text_args(page, use_line_border) for page in pages])
+
+
+def cli_query_group(page_size=AnoBbsClient.DEFAULT_GROUP_PAGE_SIZE, page_index=1) -> bool:
+    res = client().query_group_with_pages(
         page_index=page_index,
         page_size=page_size
     )
+    if res and output_format() != OutputFormat.TEXT:
+        write_records(output_format(), res["pages"], PAGE_FIELDS, document=res)
+        return True
     if res:
-        group_pages = res["pages"]
-        body = VerticalLayout([
-            Text(
-                f"No: {_page.get('first_floor', {}).get('no')}\n"
-                f"ID: {_page.get('id')}\n"
-                f"Owner: {_page.get('owner_ac')}\n"
-                f"Date: {format_time(_page.get('update_date'))}\n"
-                f"Count: {_page.get('floor_count')}\n"
-                f"Topic: {_page.get('first_floor', {}).get('content')}\n\n",
-                max_lenght=64,
-                min_lenght=0,
-                lr_padding=1,
-                lr_margin=4,
-                use_line_border=ano_bbs_client.config[ano_bbs_client.ConfigKeys.UI_USE_LINE_BORDER]
-            )
-            for _page
-            in group_pages
-        ])
+        from imcli import VerticalLayout, Text
+
+        body = VerticalLayout(create_page_texts(res["pages"]))
         header = Text(
             f"Group name: {res['name']}\n" +
             f"Number of pages: {res['pages_count']}\n" +
@@ -78,43 +215,77 @@ def cli_query_group(page_size=50, page_index=1) -> bool:
             lr_margin=1,
             use_line_border=False,
         )
-        print(header.render())
+        echo_lines(header)
         print()
-        print(body.render())
+        echo_lines(body)
         return True
     else:
         return False
 
 
-def cli_query_page(page_id, page_size=20, page_index=1) -> bool:
-    res = ano_bbs_client.query_page_with_floor(page_id, page_size, page_index)
+async def query_page_with_all_floors(page_id, page_size) -> dict:
+    from anobbs_cli.lib import AsyncAnoBbsClient
+
+    async with AsyncAnoBbsClient(client()) as async_client:
+        return await async_client.query_page_with_all_floors(page_id, page_size)
+
+
+def cli_query_page(page_id, page_size=AnoBbsClient.DEFAULT_FLOOR_PAGE_SIZE, page_index=1, all_floors=False) -> bool:
+    if all_floors and output_format() == OutputFormat.NDJSON:
+        # Each floor is written as soon as its page of floors arrives
+        return write_ndjson(client().iter_floors(page_id)) > 0
+    if all_floors:
+        import asyncio
+
+        res = asyncio.run(query_page_with_all_floors(page_id, page_size))
+    else:
+        res = client().query_page_with_floor(page_id, page_size, page_index)
+    if res and output_format() != OutputFormat.TEXT:
+        write_records(output_format(), res["floors"], FLOOR_FIELDS, document=res)
+        return True
     if res:
+        from imcli import VerticalLayout, Text
+
         floors = res["floors"]
+        if all_floors:
+            floors_range = f"0-{res['floors_count'] - 1}"
+        else:
+            floors_range = f"{page_size * (page_index - 1)}-{min(res['floors_count'] - 1, page_size * page_index)}"
         header = Text(
             f"ID: {res['id']}\n"
             f"Topic: {floors[0]['content']}\n"
             f"Number of floors: {res['floors_count']}\n"
-            f"Range: {page_size * (page_index - 1)}-{min(res['floors_count'] - 1, page_size * page_index)}",
+            f"Range: {floors_range}",
             128,
             use_line_border=False,
             lr_padding=0,
         )
-        body = VerticalLayout([
-            create_floor_text(floor)
-            for floor
-            in floors
-        ])
-        print(header.render())
+        body = VerticalLayout(create_floor_texts(floors))
+        echo_lines(header)
         print()
-        print(body.render())
+        echo_lines(body)
         return True
     else:
         return False
 
 
 def cli_query_account() -> bool:
-    res = ano_bbs_client.query_account()
+    res = client().query_account()
+    if res and output_format() != OutputFormat.TEXT:
+        codes = [
+            {"kind": "ano_code", **ac}
+            for ac
+            in res.get("ac_list", [])
+        ] + [
+            {"kind": "invitation_code", **ic}
+            for ic
+            in res.get("ic_list", [])
+        ]
+        write_records(output_format(), codes, CODE_FIELDS, document=res)
+        return True
     if res:
+        from imcli import Text
+
         ac_list = res.get("ac_list")
         ic_list = res.get("ic_list")
         print(Text(
@@ -137,15 +308,21 @@ def cli_query_account() -> bool:
 
 
 def cli_check() -> bool:
-    config_obj = ano_bbs_client.config
-    config_path = ano_bbs_client.DEFAULT_CONFIG_PATH.absolute()
-    server_addr = config_obj[ano_bbs_client.ConfigKeys.ADDR]
-    account_id = config_obj[ano_bbs_client.ConfigKeys.ACCOUNT]
+    config_obj = client().config
+    config_path = AnoBbsClient.DEFAULT_CONFIG_PATH.absolute()
+    server_addr = config_obj[AnoBbsClient.ConfigKeys.ADDR]
+    account_id = config_obj[AnoBbsClient.ConfigKeys.ACCOUNT]
 
     logger.info(f"User config file: {config_path}")
     logger.info(f"Config obj: \n{json.dumps(config_obj, indent=2)}")
     logger.info(f"Try to connect server: {server_addr}...")
-    if not ano_bbs_client.hello_world():
+    endpoints = client().endpoints
+    if len(endpoints.addresses) > 1:
+        endpoints.probe_all()
+        for status in endpoints.status():
+            state = f"{status['latency_ms']}ms" if status["healthy"] else f"down: {status['last_error']}"
+            logger.info(f"\t{status['address']}: {state}")
+    if not client().hello_world():
         logger.error(
             f"There are some errors, \n"
             f"please check the address: {server_addr}\n"
@@ -155,7 +332,12 @@ def cli_check() -> bool:
 
     logger.info("Connect server success!")
     logger.info("Try to login...")
-    if not ano_bbs_client.login():
+    try:
+        res = client().login()
+    except AnoBbsError as err:
+        logger.error(err)
+        res = None
+    if not res:
         if account_id:
             logger.error(
                 f"Login failed, \n"
@@ -165,12 +347,23 @@ def cli_check() -> bool:
             logger.error(f"You account id is empty!")
         return False
     logger.info("Login success!")
-    print()
+    if output_format() == OutputFormat.TEXT:
+        print()
     cli_query_account()
     return True
 
 
-@click.group()
+class AnoBbsGroup(click.Group):
+    def invoke(self, ctx):
+        # A failed request ends any command with its reason, not a traceback
+        try:
+            return super().invoke(ctx)
+        except AnoBbsError as err:
+            logger.error(err)
+            ctx.exit(1)
+
+
+@click.group(cls=AnoBbsGroup)
 @click.option("--version",
               is_flag=True,
               callback=print_version,
@@ -180,19 +373,45 @@ def cli_check() -> bool:
               "--debug",
               is_flag=True,
               help="Start debug mode")
+@click.option("--offline",
+              is_flag=True,
+              help="Serve pages and floors from the local cache only")
+@click.option("-P",
+              "--profile",
+              envvar="ANOBBS_PROFILE",
+              default=None,
+              help="Named profile (address, account, token, anocode) in the config file")
+@click.option("-f",
+              "--format",
+              "output_format_",
+              type=click.Choice(OutputFormat.ALL),
+              default=OutputFormat.TEXT,
+              help="Output format, json/ndjson/tsv print the raw server data")
 @click.pass_context
 def cli(
         ctx,
         debug,
+        offline,
+        profile,
+        output_format_,
 ):
     ctx.ensure_object(dict)
     set_debug_level(debug)
+    ctx.obj["offline"] = offline
+    ctx.obj["profile"] = profile
+    ctx.obj["format"] = output_format_
+    started_at, started_time = time.monotonic(), time.time()
+    ctx.call_on_close(lambda: flush_client(started_at, started_time))
 
 
 @cli.command()
 @click.pass_context
 def login(ctx):
-    res = ano_bbs_client.login()
+    try:
+        res = client().login()
+    except AnoBbsError as err:
+        logger.error(err)
+        res = None
     if res:
         print(f"Login successful, token: {res}")
         ctx.exit(0)
@@ -202,7 +421,7 @@ def login(ctx):
 
 
 @cli.command()
-@click.option("--page_size", default=30)
+@click.option("--page_size", default=AnoBbsClient.DEFAULT_GROUP_PAGE_SIZE)
 @click.option("-p", "--page_index", default=1)
 @click.pass_context
 def pages(ctx, page_size, page_index):
@@ -216,23 +435,141 @@ def pages(ctx, page_size, page_index):
 @click.argument(
     "page_id",
     type=click.STRING,
-    autocompletion=lambda *args, **kwargs: ano_bbs_client.cache[ano_bbs_client.ConfigKeys.CACHE_PAGES],
+    autocompletion=lambda ctx, args, incomplete: client().complete(CompletionCache.Kinds.PAGES, incomplete),
 )
 @click.option("-p", "--page_index", default=1)
-@click.option("--page_size", default=50)
+@click.option("--page_size", default=AnoBbsClient.DEFAULT_FLOOR_PAGE_SIZE)
+@click.option("--all", "all_floors", is_flag=True, help="Fetch every floor of the page concurrently")
 @click.pass_context
-def page(ctx, page_id, page_size, page_index):
-    if cli_query_page(page_id, page_size, page_index):
+def page(ctx, page_id, page_size, page_index, all_floors):
+    if cli_query_page(page_id, page_size, page_index, all_floors):
         ctx.exit(0)
     else:
         ctx.exit(1)
 
 
+def cli_bulk(
+        kind: AnyStr,
+        from_file,
+        page_id: Optional[AnyStr],
+        group: AnyStr,
+        jobs: int,
+        rate: float,
+        queue: bool = False,
+) -> bool:
+    from anobbs_cli.lib.bulk import BulkWriter, read_items
+
+    try:
+        items = list(read_items(from_file, kind, page_id=page_id, group_name=group))
+    except ValueError as err:
+        logger.error(f"{from_file.name}: {err}")
+        return False
+    # Journaled first, what does not get through now is sent by `anobbs flush`
+    journal = client().journal
+    records = journal.add_many(
+        {
+            "kind": item.kind,
+            "content": item.content,
+            "page_id": item.page_id,
+            "group_name": item.group_name,
+            "idempotency_key": item.idempotency_key,
+        }
+        for item
+        in items
+    )
+    for item, record in zip(items, records):
+        item.idempotency_key = record["key"]
+    if queue:
+        click.echo(f"Queued {len(records)} writes", err=True)
+        return True
+    results = []
+    # Results come in on the worker threads, they have no click context
+    fmt = output_format()
+
+    def on_result(item) -> None:
+        journal.settle(item)
+        if fmt != OutputFormat.TEXT:
+            results.append(item.as_dict())
+        elif item.status == "ok":
+            print(f"#{item.index} ok: {item.result}")
+        else:
+            print(f"#{item.index} {item.status}: {item.error}")
+
+    stats = BulkWriter(client(), workers=jobs, rate=rate).run(items, on_result=on_result)
+    if results:
+        results.sort(key=lambda result: result["index"])
+        write_records(fmt, results, BULK_FIELDS)
+    click.echo(f"Done: {stats}", err=True)
+    queued = sum(1 for item in items if item.queued)
+    if queued:
+        logger.warning(f"{queued} writes queued, `anobbs flush` sends them")
+    if stats.unknown:
+        logger.error(f"{stats.unknown} writes may have reached the server, they are not sent again")
+    return stats.ok == stats.items
+
+
+def cli_journaled_write(send, kind: AnyStr, content: AnyStr, queue: bool, **target):
+    # Logged and fsync'd before it is sent, a write that can not reach the server is kept, not lost.
+    # Returns (queued, answer).
+    journal = client().journal
+    record = journal.add(kind, content, **target)
+    if queue:
+        print(f"Queued: {record['key']}")
+        return True, None
+    try:
+        res = send(record["key"])
+    except AnoBbsError as err:
+        if not err.transient:
+            journal.failed(record["key"], str(err))
+            raise
+        if not client().write_resendable(err, record["key"]):
+            # It may have landed, a second send could make a second copy
+            journal.unknown(record["key"], str(err))
+            logger.error(f"{err}\nOutcome unknown, {record['key']} may have reached the server and is not sent again")
+            click.get_current_context().exit(1)
+        logger.warning(f"{err}\nQueued {record['key']}, sent by `anobbs flush` or the next command reaching the server")
+        return True, None
+    journal.done(record["key"], res.get("no") if isinstance(res, dict) else res)
+    return False, res
+
+
+WRITE_OPTIONS = [
+    click.option("--from-file", type=click.File("r"), default=None,
+                 help="Send every line of this file, - for stdin: NDJSON records with a content or plain lines"),
+    click.option("-j", "--jobs", default=4, show_default=True,
+                 help="Requests in flight, floors of one thread still go in order"),
+    click.option("--rate", default=5.0, show_default=True,
+                 help="Requests per second to start with, lowered while the server sheds load"),
+    click.option("--queue", is_flag=True,
+                 help="Only journal the write, `anobbs flush` sends it later"),
+]
+
+
+def write_options(func):
+    for option in reversed(WRITE_OPTIONS):
+        func = option(func)
+    return func
+
+
 @cli.command()
-@click.argument("content")
+@click.argument("content", required=False)
+@click.option("-g", "--group", default="all", show_default=True, help="Group of the new page")
+@write_options
 @click.pass_context
-def post(ctx, content):
-    res = ano_bbs_client.post_page(content)
+def post(ctx, content, group, from_file, jobs, rate, queue):
+    if from_file is not None:
+        ctx.exit(0 if cli_bulk("post", from_file, None, group, jobs, rate, queue) else 1)
+    if content is None:
+        raise click.UsageError("CONTENT or --from-file is needed")
+    queued, res = cli_journaled_write(
+        lambda key: client().post_page(content, group, idempotency_key=key),
+        "post",
+        content,
+        queue,
+        group_name=group,
+    )
+    if queued:
+        ctx.exit(0)
     if res:
         cli_query_page(res)
         ctx.exit(0)
@@ -245,19 +582,54 @@ def post(ctx, content):
 @click.argument(
     "page_id",
     type=click.STRING,
-    autocompletion=lambda *args, **kwargs: ano_bbs_client.cache[ano_bbs_client.ConfigKeys.CACHE_PAGES],
+    required=False,
+    autocompletion=lambda ctx, args, incomplete: client().complete(CompletionCache.Kinds.PAGES, incomplete),
 )
-@click.argument("content")
+@click.argument("content", required=False)
+@write_options
 @click.pass_context
-def append(ctx, page_id, content):
-    res = ano_bbs_client.append_page(page_id, content)
-    if res:
+def append(ctx, page_id, content, from_file, jobs, rate, queue):
+    if from_file is not None:
+        # PAGE_ID is where the records without their own page_id go
+        ctx.exit(0 if cli_bulk("append", from_file, page_id, "all", jobs, rate, queue) else 1)
+    if page_id is None or content is None:
+        raise click.UsageError("PAGE_ID and CONTENT, or --from-file are needed")
+    queued, res = cli_journaled_write(
+        lambda key: client().append_page(page_id, content, idempotency_key=key),
+        "append",
+        content,
+        queue,
+        page_id=page_id,
+    )
+    if queued:
+        ctx.exit(0)
+    if res and output_format() != OutputFormat.TEXT:
+        write_records(output_format(), [res], FLOOR_FIELDS, document=res)
+        ctx.exit(0)
+    elif res:
         print(create_floor_text(res).render())
         ctx.exit(0)
     else:
         ctx.exit(1)
 
 
+@cli.command()
+@click.option("-j", "--jobs", default=4, show_default=True, help="Requests in flight")
+@click.option("--batch-size", default=100, show_default=True, help="Queued writes sent per batch")
+@click.pass_context
+def flush(ctx, jobs, batch_size):
+    """Send the posts and appends queued while the server was unreachable."""
+    from anobbs_cli.lib.journal import replay_journal
+
+    journal = client().journal
+    if not journal.has_pending():
+        click.echo("Nothing queued", err=True)
+        ctx.exit(0)
+    stats = replay_journal(client(), journal, workers=jobs, batch_size=batch_size)
+    click.echo(f"Flushed: {stats}", err=True)
+    ctx.exit(1 if stats.pending or stats.failed or stats.unknown else 0)
+
+
 @cli.command()
 @click.option(
     "-a",
@@ -269,7 +641,7 @@ def append(ctx, page_id, content):
 def account(ctx, account_id):
     if account_id is not None:
         logger.info(f"Set account to {account_id}")
-        ano_bbs_client.set_account(account_id)
+        client().set_account(account_id)
     ctx.exit(0 if cli_check() else 1)
 
 
@@ -278,21 +650,21 @@ def account(ctx, account_id):
 @click.option(
     "-a",
     "--address",
-    default=None,
-    help="Set AnoBBS service address"
+    multiple=True,
+    help="Set AnoBBS service address, repeat it for replicas: the first one takes the writes"
 )
 @click.pass_context
 def addr(ctx, address):
-    if address is not None:
-        logger.info(f"Set address to {address}")
-        ano_bbs_client.set_service_address(address)
+    if address:
+        logger.info(f"Set address to {', '.join(address)}")
+        client().set_service_address(address)
     ctx.exit(0 if cli_check() else 1)
 
 
 @cli.command()
 @click.pass_context
 def config(ctx):
-    config_obj = ano_bbs_client.config
+    config_obj = client().config
     print(json.dumps(config_obj, indent=2))
     ctx.exit(0)
 
@@ -306,7 +678,7 @@ def check(ctx):
 @cli.command()
 @click.pass_context
 def create_ic(ctx):
-    res = ano_bbs_client.create_ic()
+    res = client().create_ic()
     if res:
         print(f"New InvitationCode: {res}")
         ctx.exit(0)
@@ -317,10 +689,10 @@ def create_ic(ctx):
 @cli.command()
 @click.pass_context
 def create_ac(ctx):
-    res = ano_bbs_client.create_ac()
+    res = client().create_ac()
     if res:
         print(f"New AnoCode: {res}")
-        ano_bbs_client.query_account()
+        client().query_account()
         ctx.exit(0)
     else:
         ctx.exit(1)
@@ -330,7 +702,7 @@ def create_ac(ctx):
 @click.argument("invitation_code")
 @click.pass_context
 def register(ctx, invitation_code):
-    res = ano_bbs_client.create_account(invitation_code)
+    res = client().create_account(invitation_code)
     if res:
         cli_query_account()
         ctx.exit(0)
@@ -338,6 +710,245 @@ def register(ctx, invitation_code):
         ctx.exit(1)
 
 
+@cli.command()
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option("-g", "--group", "groups", multiple=True, help="Group to dump, repeatable, default every group")
+@click.option("-j", "--jobs", default=8, show_default=True, help="Threads fetched concurrently")
+@click.option("--gzip/--no-gzip", "compress", default=None, help="Compress the output, default by a .gz suffix")
+@click.option("--overwrite", is_flag=True, help="Start over even if OUTPUT already exists")
+@click.pass_context
+def dump(ctx, output, groups, jobs, compress, overwrite):
+    """Export every thread with its floors to OUTPUT as NDJSON, resuming an interrupted dump."""
+    from anobbs_cli.lib.dump import BoardDump
+
+    board_dump = BoardDump(client(), output, compress=compress, workers=jobs, groups=groups)
+    if overwrite:
+        board_dump.finish()
+        if board_dump.output.exists():
+            board_dump.output.unlink()
+    elif board_dump.output.exists() and not board_dump.resumable:
+        logger.error(f"{output} already exists and has no checkpoint, use --overwrite to start over")
+        ctx.exit(1)
+
+    try:
+        stats = board_dump.run(on_progress=lambda progress: click.echo(str(progress), err=True))
+    except KeyboardInterrupt:
+        logger.warning(f"Interrupted, run the same command again to resume: {board_dump.checkpoint_path}")
+        ctx.exit(130)
+    except (ValueError, RuntimeError) as err:
+        logger.error(err)
+        ctx.exit(1)
+
+    click.echo(f"Done in {stats.elapsed:.0f}s: {stats}", err=True)
+    if stats.failed:
+        logger.warning(f"{stats.failed} threads failed, run the same command again to retry them")
+        ctx.exit(1)
+    board_dump.finish()
+    ctx.exit(0)
+
+
+@cli.command()
+@click.option("-g", "--group", "groups", multiple=True, help="Group to sync, repeatable, default every group")
+@click.option("--db", default=str(AnoBbsClient.DEFAULT_MIRROR_PATH), show_default=True, help="Mirror database")
+@click.option("-j", "--jobs", default=4, show_default=True, help="Pages fetched concurrently")
+@click.option("--full", is_flag=True, help="Check every page instead of stopping at the first unchanged ones")
+@click.pass_context
+def sync(ctx, groups, db, jobs, full):
+    """Bring the local mirror up to date, fetching only new floors."""
+    from anobbs_cli.lib.mirror import Mirror, MirrorSync
+
+    mirror = Mirror(db)
+    mirror_sync = MirrorSync(
+        client(),
+        mirror,
+        workers=jobs,
+        stop_after=None if full else AnoBbsClient.DEFAULT_GROUP_PAGE_SIZE,
+    )
+    try:
+        stats = mirror_sync.run(groups)
+    except (ValueError, RuntimeError) as err:
+        logger.error(err)
+        ctx.exit(1)
+    finally:
+        mirror.close()
+
+    click.echo(f"Synced: {stats}", err=True)
+    ctx.exit(1 if stats.failed else 0)
+
+
+@cli.command()
+@click.argument("query")
+@click.option("-o", "--owner", default=None, help="Only floors of this anocode")
+@click.option("-g", "--group", default=None, help="Only floors of pages in this group")
+@click.option("--since", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Posted on or after this day")
+@click.option("--until", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Posted before this day")
+@click.option("-n", "--limit", default=20, show_default=True)
+@click.pass_context
+def search(ctx, query, owner, group, since, until, limit):
+    """Search every floor fetched so far, the server has no search."""
+    res = client().search_index.search(
+        query,
+        owner_ac=owner,
+        group_name=group,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+        limit=limit,
+    )
+    if output_format() != OutputFormat.TEXT:
+        write_records(output_format(), res, ["no", "page_id", "owner_ac", "create_date", "score", "content"])
+        ctx.exit(0 if res else 1)
+
+    from imcli import VerticalLayout, Text
+
+    use_line_border = client().config_value(AnoBbsClient.ConfigKeys.UI_USE_LINE_BORDER)
+    echo_lines(Text(f"Query: {query}\nResults: {len(res)}\n", max_lenght=128, min_lenght=0, use_line_border=False))
+    if not res:
+        ctx.exit(1)
+    echo_lines(VerticalLayout([
+        Text(
+            f"No.{floor['no']}  Page: {floor['page_id']}\n"
+            f"Owner: {floor['owner_ac']}\n"
+            f"Date: {format_time(floor['create_date'])}\n"
+            f"\n"
+            f"\t{floor['content']}\n",
+            max_lenght=64,
+            lr_padding=0,
+            lr_margin=4,
+            use_line_border=use_line_border,
+        )
+        for floor
+        in res
+    ]))
+    ctx.exit(0)
+
+
+@cli.command()
+@click.argument(
+    "page_id",
+    type=click.STRING,
+    required=False,
+    autocompletion=lambda ctx, args, incomplete: client().complete(CompletionCache.Kinds.PAGES, incomplete),
+)
+@click.option("-g", "--group", default="all", show_default=True, help="Group to watch without a PAGE_ID")
+@click.option("--tail", default=10, show_default=True, help="Floors shown when a thread watch starts, -1 for all")
+@click.option("--min-interval", default=2.0, show_default=True, help="Seconds between polls under activity")
+@click.option("--max-interval", default=60.0, show_default=True, help="Seconds between polls when idle")
+@click.option("-n", "--polls", type=int, default=None, help="Stop after this many polls")
+@click.pass_context
+def watch(ctx, page_id, group, tail, min_interval, max_interval, polls):
+    """Follow a thread, or a group without PAGE_ID, printing only what is new."""
+    from anobbs_cli.lib.watch import AdaptiveInterval, BoardWatcher, ThreadWatcher
+
+    interval = AdaptiveInterval(min_interval, max_interval)
+    if page_id is None:
+        watcher = BoardWatcher(client(), group, interval=interval)
+        fields, create_texts = PAGE_FIELDS, create_page_texts
+    else:
+        watcher = ThreadWatcher(client(), page_id, interval=interval, tail=None if tail < 0 else tail)
+        fields, create_texts = FLOOR_FIELDS, create_floor_texts
+
+    header = True
+    try:
+        for batch in watcher.watch(polls):
+            if output_format() == OutputFormat.TEXT:
+                from imcli import VerticalLayout
+
+                echo_lines(VerticalLayout(create_texts(batch)))
+            else:
+                # A watch never ends, json is written one document per line like ndjson
+                write_records(
+                    OutputFormat.NDJSON if output_format() == OutputFormat.JSON else output_format(),
+                    batch,
+                    fields,
+                    header=header,
+                )
+                header = False
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    ctx.exit(0)
+
+
+@cli.group()
+@click.pass_context
+def daemon(_):
+    """Keep one client hot behind a Unix socket, every other command is forwarded to it."""
+    pass
+
+
+@daemon.command()
+@click.pass_context
+def run(ctx):
+    """Serve in the foreground."""
+    from anobbs_cli.daemon import DaemonServer
+
+    server = DaemonServer()
+    logger.info(f"Serving on {server.socket_path}")
+    server.serve_forever()
+    ctx.exit(0)
+
+
+@daemon.command()
+@click.option("--timeout", default=10.0, show_default=True, help="Seconds to wait for the daemon to come up")
+@click.pass_context
+def start(ctx, timeout):
+    """Start in the background."""
+    import subprocess
+
+    from anobbs_cli.daemon import DaemonServer
+
+    reply = DaemonServer.control("ping")
+    if reply is not None:
+        print(f"Daemon already running, pid {reply.get('pid')}")
+        ctx.exit(0)
+    log_path = AnoBbsClient.DEFAULT_CONFIG_PATH.parent / "daemon.log"
+    with open(log_path, "ab") as log_file:
+        subprocess.Popen(
+            [sys.executable, "-m", "anobbs_cli", "daemon", "run"],
+            stdin=subprocess.DEVNULL,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        reply = DaemonServer.control("ping")
+        if reply is not None:
+            print(f"Daemon started, pid {reply.get('pid')}")
+            ctx.exit(0)
+        time.sleep(0.05)
+    logger.error(f"Daemon did not come up, see {log_path}")
+    ctx.exit(1)
+
+
+@daemon.command()
+@click.pass_context
+def stop(ctx):
+    """Stop the background daemon."""
+    from anobbs_cli.daemon import DaemonServer
+
+    if DaemonServer.control("stop") is None:
+        print("Daemon not running")
+        ctx.exit(1)
+    print("Daemon stopped")
+    ctx.exit(0)
+
+
+@daemon.command()
+@click.pass_context
+def status(ctx):
+    """Tell whether the daemon is running, and its pid."""
+    from anobbs_cli.daemon import DaemonServer
+
+    reply = DaemonServer.control("ping")
+    if reply is None:
+        print("Daemon not running")
+        ctx.exit(1)
+    print(f"Daemon running, pid {reply.get('pid')}")
+    ctx.exit(0)
+
+
 @cli.group()
 @click.pass_context
 def admin(_):
@@ -346,30 +957,117 @@ def admin(_):
 
 @admin.command()
 @click.argument(
-    "floor_no",
+    "floor_nos",
+    nargs=-1,
     type=click.STRING,
-    autocompletion=lambda *args, **kwargs: ano_bbs_client.cache[ano_bbs_client.ConfigKeys.CACHE_NOS],
+    autocompletion=lambda ctx, args, incomplete: client().complete(CompletionCache.Kinds.NOS, incomplete),
+)
+@click.option("--from-file", type=click.File("r"), default=None, help="Floor numbers, one per line, - for stdin")
+@click.option(
+    "--page",
+    "page_id",
+    default=None,
+    autocompletion=lambda ctx, args, incomplete: client().complete(CompletionCache.Kinds.PAGES, incomplete),
+    help="With --anocode: every floor of that anocode in this page",
+)
+@click.option(
+    "--anocode",
+    default=None,
+    autocompletion=lambda ctx, args, incomplete: client().complete(CompletionCache.Kinds.ACS, incomplete),
+    help="With --page: every floor of this anocode in that page",
 )
+@click.option("-j", "--jobs", default=4, show_default=True, help="Blocks in flight")
 @click.pass_context
-def block(ctx, floor_no):
-    res = ano_bbs_client.block_ac_by_floor_no(floor_no)
-    if res:
-        print(f"Anocode blocked: {res}")
-        ctx.exit(0)
-    else:
-        ctx.exit(1)
+def block(ctx, floor_nos, from_file, page_id, anocode, jobs):
+    """Block the anocodes of FLOOR_NOS, one block per anocode."""
+    from anobbs_cli.lib.moderation import BlockBatch, BlockOutcome
+
+    if (page_id is None) != (anocode is None):
+        raise click.UsageError("--page and --anocode go together")
+    batch = BlockBatch(client(), workers=jobs)
+    floors = list(floor_nos)
+    if from_file is not None:
+        floors.extend(line.strip() for line in from_file if line.strip())
+    if page_id is not None:
+        selected = batch.select(page_id, anocode)
+        if not selected:
+            logger.warning(f"No floor of {anocode} in {page_id}")
+        floors.extend(selected)
+    if not floors:
+        raise click.UsageError("FLOOR_NOS, --from-file or --page/--anocode are needed")
+
+    fmt = output_format()
+    results = []
+
+    def on_result(outcome) -> None:
+        if fmt != OutputFormat.TEXT:
+            results.append(outcome.as_dict())
+        elif outcome.status == BlockOutcome.BLOCKED:
+            print(f"No.{outcome.floor_no}: anocode blocked: {outcome.ano_code}")
+        elif outcome.status == BlockOutcome.DUPLICATE:
+            print(f"No.{outcome.floor_no}: {outcome.ano_code} already blocked by No.{outcome.covered_by}")
+        else:
+            print(f"No.{outcome.floor_no}: failed: {outcome.error}")
+
+    outcomes = batch.run(batch.outcomes(floors), on_result=on_result)
+    if results:
+        write_records(fmt, results, ["floor_no", "status", "ano_code", "covered_by", "error"])
+    failed = sum(1 for outcome in outcomes if outcome.status == BlockOutcome.FAILED)
+    if len(outcomes) > 1:
+        blocked = len({outcome.ano_code for outcome in outcomes if outcome.status == BlockOutcome.BLOCKED})
+        click.echo(f"{len(outcomes)} floors, {blocked} anocodes blocked, {failed} failed", err=True)
+    ctx.exit(1 if failed else 0)
 
 
 @admin.command()
+@click.option("--root", "root_id", default=None, help="Only the subtree of this account")
+@click.option("-d", "--depth", type=click.IntRange(min=0), default=None, help="Levels shown below the top")
+@click.option("--ancestors", "ancestors_of", default=None, help="The invitation chain from the root to this account")
+@click.option("--counts", is_flag=True, default=False, help="Descendants of every account")
 @click.pass_context
-def account_tree(ctx):
-    res = ano_bbs_client.query_account_tree()
-    if res:
-        print(res)
-        ctx.exit(0)
-    else:
+def account_tree(ctx, root_id, depth, ancestors_of, counts):
+    """Invitation tree, one account per line."""
+    if root_id is not None and ancestors_of is not None:
+        raise click.UsageError("--root and --ancestors don't go together")
+    fmt = output_format()
+    options = root_id is not None or depth is not None or ancestors_of is not None or counts
+    if fmt == OutputFormat.JSON and not options:
+        # The server's own document, unchanged
+        res = client().query_account_tree()
+        if res:
+            write_json(res)
+        ctx.exit(0 if res else 1)
+
+    try:
+        tree = client().account_tree()
+    except ValueError as err:
+        logger.error(f"Unreadable account tree: {err}")
+        ctx.exit(1)
+    if tree is None:
+        ctx.exit(1)
+    try:
+        root = tree.index_of(root_id) if root_id is not None else None
+        target = tree.index_of(ancestors_of) if ancestors_of is not None else None
+    except KeyError as err:
+        logger.error(err.args[0])
         ctx.exit(1)
 
+    if target is not None:
+        path = tree.ancestors(target) + [target]
+        indexes = path if depth is None else path[:depth + 1]
+        if fmt == OutputFormat.TEXT:
+            lines = tree.render_path(indexes, counts)
+    else:
+        indexes = tree.walk(root, depth)
+        if fmt == OutputFormat.TEXT:
+            lines = tree.render(root, depth, counts)
+
+    if fmt == OutputFormat.TEXT:
+        sys.stdout.writelines(line + "\n" for line in lines)
+    else:
+        write_records(fmt, (tree.record(i) for i in indexes), ACCOUNT_FIELDS)
+    ctx.exit(0)
+
 
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,124 @@
+__all__ = [
+    "CompletionIndex",
+    "fast_complete",
+]
+
+# Shell completion runs on every TAB press, keep this module free of
+# anything heavier than the standard library bits imported below (not even typing).
+import bisect
+import os
+import sys
+
+
+# Same variable as the --profile option of the cli
+PROFILE_VAR = "ANOBBS_PROFILE"
+
+
+class CompletionIndex:
+    DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".config", "anobbs_cli", "completion_index")
+
+    def __init__(self, index_dir: str = DEFAULT_DIR):
+        self._index_dir = index_dir
+
+    @classmethod
+    def for_profile(cls, profile: str = None) -> "CompletionIndex":
+        # Each profile completes the ids of its own server
+        return cls() if profile is None else cls(f"{cls.DEFAULT_DIR}.{profile}")
+
+    def path(self, kind: str) -> str:
+        return os.path.join(self._index_dir, kind)
+
+    def write(self, kind: str, values: list) -> None:
+        os.makedirs(self._index_dir, exist_ok=True)
+        path = self.path(kind)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(sorted(set(values))))
+        os.replace(tmp_path, path)
+
+    def lookup(self, kind: str, prefix: str = "") -> list:
+        try:
+            with open(self.path(kind), "r", encoding="utf-8") as file:
+                values = file.read().split("\n")
+        except FileNotFoundError:
+            return []
+        if values == [""]:
+            return []
+        start = bisect.bisect_left(values, prefix)
+        end = bisect.bisect_left(values, prefix + "\U0010ffff", start)
+        return values[start:end]
+
+
+# Positional words leading to a dynamic argument -> index kind (CompletionCache.Kinds)
+COMPLETION_TARGETS = {
+    ("page",): "page_id",
+    ("append",): "page_id",
+    ("admin", "block"): "floor_no",
+}
+# Targets taking any number of values, every word after their prefix completes the same way
+VARIADIC_TARGETS = {("admin", "block")}
+# Every option of the cli taking a value, add new ones here or their value reads as a command or
+# an argument. `-d` is left out: it is --debug, a flag, in front of the command.
+OPTIONS_WITH_VALUE = {
+    "-p", "--page_index", "--page_size", "-f", "--format", "-P", "--profile",
+    "--from-file", "--page", "--anocode", "-j", "--jobs", "--rate", "--batch-size",
+    "-g", "--group", "-a", "--account-id", "--address", "--db",
+    "-o", "--owner", "--since", "--until", "-n", "--limit", "--polls",
+    "--tail", "--min-interval", "--max-interval", "--timeout",
+    "--root", "--depth", "--ancestors",
+}
+
+
+def completion_kind(positional: list):
+    kind = COMPLETION_TARGETS.get(tuple(positional))
+    if kind is None:
+        prefix = next((target for target in VARIADIC_TARGETS if tuple(positional[:len(target)]) == target), None)
+        kind = COMPLETION_TARGETS.get(prefix)
+    return kind
+
+
+def fast_complete(complete_var: str = "_ANOBBS_COMPLETE", index: "CompletionIndex" = None) -> bool:
+    instruction = os.environ.get(complete_var, "")
+    command, _, shell = instruction.partition("_")
+    shell = shell or "bash"
+    if command != "complete" or "COMP_WORDS" not in os.environ:
+        return False
+
+    cwords = os.environ["COMP_WORDS"].split()
+    if shell == "fish":
+        args = cwords[1:]
+        incomplete = os.environ.get("COMP_CWORD", "")
+    else:
+        cword = int(os.environ.get("COMP_CWORD", 0))
+        args = cwords[1:cword]
+        incomplete = cwords[cword] if cword < len(cwords) else ""
+    if incomplete.startswith("-"):
+        return False
+
+    positional = []
+    profile = os.environ.get(PROFILE_VAR) or None
+    option = None
+    skip_next = False
+    for arg in args:
+        if skip_next:
+            skip_next = False
+            if option in ("-P", "--profile"):
+                profile = arg
+        elif arg.startswith("--profile="):
+            profile = arg.partition("=")[2]
+        elif arg.startswith("-"):
+            option = arg
+            skip_next = arg in OPTIONS_WITH_VALUE
+        else:
+            positional.append(arg)
+    kind = completion_kind(positional)
+    if skip_next or kind is None:
+        return False
+
+    values = (index or CompletionIndex.for_profile(profile)).lookup(kind, incomplete)
+    if shell == "zsh":
+        # click's zsh script reads (value, description) pairs, "_" means no description
+        sys.stdout.write("".join(f"{value}\n_\n" for value in values))
+    else:
+        sys.stdout.write("".join(f"{value}\n" for value in values))
+    return True
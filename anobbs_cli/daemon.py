@@ -0,0 +1,244 @@
+__all__ = [
+    "DaemonServer",
+    "forward",
+]
+
+# The front-end half runs on every invocation before anything else is imported,
+# keep it on the standard library modules imported below (not even typing).
+import json
+import os
+import socket
+import sys
+
+from anobbs_cli.completion_index import OPTIONS_WITH_VALUE
+
+DEFAULT_SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".config", "anobbs_cli", "daemon.sock")
+# Set to run every command in-process even while a daemon is up
+NO_DAEMON_VAR = "ANOBBS_NO_DAEMON"
+# Environment variables sent along with each command
+ENV_PREFIX = "ANOBBS_"
+# Long running commands gain nothing from a warm process and would hold the daemon.
+# The daemon's stdin is /dev/null, so a command reading stdin (a `-` argument, such as
+# `--from-file -`) runs here too: the shell's stdin is not passed over the socket.
+NOT_FORWARDED = {"daemon", "dump", "sync", "watch"}
+
+
+def _command_name(argv: list) -> str:
+    skip_next = False
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+        elif arg.startswith("-"):
+            skip_next = arg in OPTIONS_WITH_VALUE
+        else:
+            return arg
+    return ""
+
+
+def _reads_stdin(argv: list) -> bool:
+    return any(arg == "-" or arg.endswith("=-") for arg in argv)
+
+
+def _send(sock: socket.socket, message: dict) -> None:
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def _forwarded_env() -> dict:
+    # ANOBBS_PROFILE and the like, read by the command in the daemon as if it ran here
+    return {name: value for name, value in os.environ.items() if name.startswith(ENV_PREFIX)}
+
+
+def forward(argv: list, socket_path: str = DEFAULT_SOCKET_PATH):
+    # Exit code of the command run by the daemon, None when it has to run in this process
+    if os.environ.get(NO_DAEMON_VAR) or not os.path.exists(socket_path):
+        return None
+    if _command_name(argv) in NOT_FORWARDED or not sys.stdin.isatty() or _reads_stdin(argv):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        # A socket left behind by a daemon that is gone
+        sock.close()
+        return None
+
+    with sock, sock.makefile("rb") as replies:
+        _send(sock, {"argv": argv, "cwd": os.getcwd(), "env": _forwarded_env()})
+        for line in replies:
+            reply = json.loads(line)
+            if "exit" in reply:
+                return reply["exit"]
+            stream = sys.stdout if reply.get("stream") == "stdout" else sys.stderr
+            stream.write(reply["data"])
+            stream.flush()
+    # The daemon went away mid command, its output so far is all there is
+    return 1
+
+
+class _StreamRouter:
+    # Stands in for sys.stdout/sys.stderr in the daemon, every handler thread writes
+    # to its own client and anything else goes to the daemon's own stream
+    def __init__(self, name: str, fallback):
+        import threading
+
+        self._name = name
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def bind(self, sock) -> None:
+        self._local.sock = sock
+        self._local.buffer = []
+
+    def unbind(self) -> None:
+        self.flush()
+        self._local.sock = None
+
+    def write(self, data: str) -> int:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            return self._fallback.write(data)
+        if not isinstance(data, str):
+            # click probes for a binary stream with b""
+            raise TypeError("write() argument must be str")
+        self._local.buffer.append(data)
+        if data.endswith("\n") and sum(map(len, self._local.buffer)) > 64 * 1024:
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            self._fallback.flush()
+            return
+        if self._local.buffer:
+            data = "".join(self._local.buffer)
+            self._local.buffer = []
+            _send(sock, {"stream": self._name, "data": data})
+
+    def isatty(self) -> bool:
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._fallback, name)
+
+
+class DaemonServer:
+    # One hot client for every command sent to the socket. Commands run one at a time:
+    # they share the client and the working directory.
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH):
+        self.socket_path = socket_path
+
+    def run_command(self, argv: list, cwd: str, env: dict = None) -> int:
+        import logging
+
+        import click
+
+        from anobbs_cli.app import cli
+        from anobbs_cli.lib import all_clients, drop_clients
+
+        if any(client.config_changed_on_disk() for client in all_clients()):
+            # `anobbs addr`, `anobbs login` or an editor changed the config file behind our back
+            logging.getLogger("Daemon").info("Config file changed, reloading")
+            drop_clients()
+        os.chdir(cwd)
+        # The front-end's ANOBBS_* variables stand in for the daemon's own while the command runs
+        saved_env = {name: value for name, value in os.environ.items() if name.startswith(ENV_PREFIX)}
+        if env is not None:
+            for name in saved_env:
+                del os.environ[name]
+            os.environ.update(env)
+        try:
+            return cli.main(args=argv, prog_name="anobbs", standalone_mode=False) or 0
+        except click.ClickException as error:
+            error.show()
+            return error.exit_code
+        except click.Abort:
+            sys.stderr.write("Aborted!\n")
+            return 1
+        except SystemExit as error:
+            return error.code if isinstance(error.code, int) else 1
+        finally:
+            for name in [name for name in os.environ if name.startswith(ENV_PREFIX)]:
+                del os.environ[name]
+            os.environ.update(saved_env)
+
+    def serve_forever(self) -> None:
+        import logging
+        import socketserver
+        import threading
+
+        from anobbs_cli.lib import all_clients, get_client
+
+        daemon = self
+        stdout = sys.stdout = _StreamRouter("stdout", sys.stdout)
+        stderr = sys.stderr = _StreamRouter("stderr", sys.stderr)
+        # Log records follow the command's stderr, handlers keep the stream they were made with
+        for handler in logging.getLogger().handlers:
+            if isinstance(handler, logging.StreamHandler) and handler.stream is stderr._fallback:
+                handler.setStream(stderr)
+        command_lock = threading.Lock()
+        server_cwd = os.getcwd()
+        # Built once up front, every command after this reuses its connections and caches
+        get_client()
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                request = json.loads(self.rfile.readline() or b"{}")
+                if request.get("control") == "stop":
+                    _send(self.connection, {"exit": 0})
+                    threading.Thread(target=server.shutdown).start()
+                    return
+                if request.get("control") == "ping":
+                    _send(self.connection, {"exit": 0, "pid": os.getpid()})
+                    return
+                with command_lock:
+                    stdout.bind(self.connection)
+                    stderr.bind(self.connection)
+                    try:
+                        code = daemon.run_command(
+                            request.get("argv", []),
+                            request.get("cwd", server_cwd),
+                            request.get("env"),
+                        )
+                    except BrokenPipeError:
+                        return
+                    finally:
+                        os.chdir(server_cwd)
+                        try:
+                            stdout.unbind()
+                            stderr.unbind()
+                        except OSError:
+                            pass
+                    _send(self.connection, {"exit": code})
+
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        old_umask = os.umask(0o177)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            for client in all_clients():
+                client.flush_config()
+
+    @staticmethod
+    def control(command: str, socket_path: str = DEFAULT_SOCKET_PATH):
+        # Reply of a running daemon, None when there is none
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            return None
+        with sock, sock.makefile("rb") as replies:
+            _send(sock, {"control": command})
+            line = replies.readline()
+        return json.loads(line) if line else None
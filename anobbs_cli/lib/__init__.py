@@ -1 +1,13 @@
 from .anobbs_client import *
+from .completion_cache import *
+from .errors import *
+
+
+def __getattr__(name):
+    if name == "ano_bbs_client":
+        return get_client()
+    if name == "AsyncAnoBbsClient":
+        # asyncio is only loaded by the commands that fetch concurrently
+        from .async_anobbs_client import AsyncAnoBbsClient
+        return AsyncAnoBbsClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,185 @@
+__all__ = [
+    "AccountTree",
+]
+
+import json
+import re
+from array import array
+from typing import Optional, AnyStr, List, Iterator, Iterable
+
+# Tree drawing in front of a label: indentation, box drawing characters and their ASCII stand-ins
+_PREFIX_PATTERN = re.compile(r"^[\s─-╿|`+\-]*")
+_ID_KEYS = ("id", "account_id", "name")
+_CHILDREN_KEYS = ("children", "invitees", "nodes")
+
+
+class AccountTree:
+    # Accounts in preorder: a subtree is the contiguous run [i, i + size[i]). The structure is
+    # parallel arrays, the parent index (-1 for a root), the depth and the subtree size, with an
+    # id -> index map; children are found by skipping over sibling subtrees, and every count is
+    # one pass over the arrays, whatever the shape of the tree.
+    def __init__(self, ids: List[AnyStr], labels: List[AnyStr], parents: Iterable[int]):
+        self.ids = ids
+        self.labels = labels
+        self.parent = array("l", parents)
+        count = len(ids)
+        self.depth = array("l", [0]) * count
+        self.size = array("l", [1]) * count
+        for i in range(count):
+            if self.parent[i] >= 0:
+                self.depth[i] = self.depth[self.parent[i]] + 1
+        # Children come after their parent in preorder, so walking backwards sees every child first
+        for i in range(count - 1, -1, -1):
+            if self.parent[i] >= 0:
+                self.size[self.parent[i]] += self.size[i]
+        self.index = {}
+        for i, account_id in enumerate(ids):
+            self.index.setdefault(account_id, i)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def parse(cls, data) -> "AccountTree":
+        if isinstance(data, str):
+            # A JSON document sent as text is still JSON, anything else is a drawn tree
+            try:
+                data = json.loads(data)
+            except ValueError:
+                return cls.parse_text(data)
+            if isinstance(data, str):
+                return cls.parse(data)
+        ids, labels, parents = [], [], []
+        # Explicit stack, an invitation chain can be deeper than the recursion limit
+        stack = [(node, -1) for node in reversed(data if isinstance(data, list) else [data])]
+        while stack:
+            node, parent = stack.pop()
+            account_id, children = cls.__node_fields(node)
+            parents.append(parent)
+            ids.append(account_id)
+            labels.append(account_id)
+            me = len(ids) - 1
+            stack.extend((child, me) for child in reversed(children))
+        return cls(ids, labels, parents)
+
+    @staticmethod
+    def __node_fields(node) -> tuple:
+        if not isinstance(node, dict):
+            return str(node), []
+        for key in _ID_KEYS:
+            if key in node:
+                children = next((node[key] for key in _CHILDREN_KEYS if key in node), [])
+                return str(node[key]), list(children or [])
+        if len(node) == 1:
+            # {"<id>": {"children": [...]}}, as treelib's to_dict() writes it
+            (account_id, value), = node.items()
+            children = value.get("children", []) if isinstance(value, dict) else []
+            return str(account_id), list(children or [])
+        raise ValueError(f"Not an account node: {node!r:.80}")
+
+    @classmethod
+    def parse_text(cls, text: AnyStr) -> "AccountTree":
+        # The column where a label starts gives its nesting, whatever the drawing style
+        ids, labels, parents = [], [], []
+        stack = []
+        for line in text.splitlines():
+            column = _PREFIX_PATTERN.match(line).end()
+            label = line[column:].strip()
+            if not label:
+                continue
+            while stack and stack[-1][0] >= column:
+                stack.pop()
+            parents.append(stack[-1][1] if stack else -1)
+            ids.append(label.split()[0])
+            labels.append(label)
+            stack.append((column, len(ids) - 1))
+        return cls(ids, labels, parents)
+
+    def index_of(self, account_id: AnyStr) -> int:
+        try:
+            return self.index[account_id]
+        except KeyError:
+            raise KeyError(f"No account {account_id} in the tree") from None
+
+    def roots(self) -> Iterator[int]:
+        i = 0
+        while i < len(self.ids):
+            yield i
+            i += self.size[i]
+
+    def children(self, i: int) -> Iterator[int]:
+        child, end = i + 1, i + self.size[i]
+        while child < end:
+            yield child
+            child += self.size[child]
+
+    def subtree(self, i: int) -> range:
+        return range(i, i + self.size[i])
+
+    def ancestors(self, i: int) -> List[int]:
+        # Root first, `i` itself left out
+        path = []
+        i = self.parent[i]
+        while i >= 0:
+            path.append(i)
+            i = self.parent[i]
+        path.reverse()
+        return path
+
+    def child_count(self, i: int) -> int:
+        return sum(1 for _ in self.children(i))
+
+    def walk(self, root: Optional[int] = None, max_depth: Optional[int] = None) -> Iterator[int]:
+        # Preorder indexes of the whole forest or of one subtree, `max_depth` counted from its top
+        tops = self.roots() if root is None else [root]
+        for top in tops:
+            base = self.depth[top]
+            i, end = top, top + self.size[top]
+            while i < end:
+                yield i
+                if max_depth is not None and self.depth[i] - base >= max_depth:
+                    # Below the limit: the whole subtree is skipped in one step
+                    i += self.size[i]
+                else:
+                    i += 1
+
+    def record(self, i: int) -> dict:
+        return {
+            "id": self.ids[i],
+            "parent": self.ids[self.parent[i]] if self.parent[i] >= 0 else None,
+            "depth": self.depth[i],
+            "children": self.child_count(i),
+            "descendants": self.size[i] - 1,
+        }
+
+    def render(
+            self,
+            root: Optional[int] = None,
+            max_depth: Optional[int] = None,
+            counts: bool = False,
+    ) -> Iterator[AnyStr]:
+        # One line at a time, drawn like `tree`: a node is the last child when its subtree
+        # ends where its parent's does. `indents[level]` is the drawing in front of the
+        # children of the node last seen at `level`, each one extends its parent's.
+        base = self.depth[root] if root is not None else 0
+        indents = []
+        for i in self.walk(root, max_depth):
+            level = self.depth[i] - base
+            del indents[level:]
+            if level == 0:
+                indents.append("")
+                yield self.__label(i, counts)
+                continue
+            parent = self.parent[i]
+            is_last = i + self.size[i] == parent + self.size[parent]
+            indent = indents[-1]
+            indents.append(indent + ("    " if is_last else "│   "))
+            yield indent + ("└── " if is_last else "├── ") + self.__label(i, counts)
+
+    def render_path(self, path: List[int], counts: bool = False) -> Iterator[AnyStr]:
+        # A chain such as ancestors(i) + [i], every account drawn as the only child of the one above
+        for level, i in enumerate(path):
+            yield ("    " * (level - 1) + "└── " if level else "") + self.__label(i, counts)
+
+    def __label(self, i: int, counts: bool) -> AnyStr:
+        return self.labels[i] + (f" ({self.size[i] - 1})" if counts and self.size[i] > 1 else "")
@@ -1,18 +1,49 @@
 __all__ = [
-    "ano_bbs_client",
+    "AnoBbsClient",
+    "all_clients",
+    "drop_clients",
+    "get_client",
 ]
 
+import atexit
+import contextlib
 import copy
 import json
 import logging
 import os
 import pathlib
-from typing import Optional, AnyStr, List
-
-import requests
+import threading
+import time
+from typing import Optional, AnyStr, List, Iterator, Callable, TYPE_CHECKING
+
+from ..completion_index import CompletionIndex
+from .account_tree import AccountTree
+from .completion_cache import CompletionCache
+from .endpoints import EndpointPool
+from .errors import (
+    AnoBbsError,
+    ApiError,
+    CircuitOpenError,
+    NotCachedError,
+    NotLoggedInError,
+    ServerError,
+    TransportError,
+)
+from .file_lock import FileLock
+from .http_transport import HttpTransport
+from .journal import WriteJournal
+from .paging import PageSizeTuner
+from .resilience import CircuitBreaker, RetryPolicy
+from .response_cache import ResponseCache
+from .search_index import SearchIndex
+
+if TYPE_CHECKING:
+    import requests
 
 logger = logging.getLogger("AnoBbsClient")
 
+_REMOVED = object()
+
 
 class AnoBbsClient:
     class ConfigKeys:
@@ -22,13 +53,54 @@ class AnoBbsClient:
         TOKEN = "token"
         ANOCODES = "ano_codes"
         NOW_ANOCODE = "now_ano_code"
+        PROFILES = "profiles"
         UI_USE_LINE_BORDER = "use_line_border"
-        # Cache
+        UI_RENDER_CACHE_ON_DISK = "render_cache_on_disk"
+        # Http
+        HTTP_POOL_SIZE = "http_pool_size"
+        HTTP_CONNECT_TIMEOUT = "http_connect_timeout"
+        HTTP_READ_TIMEOUT = "http_read_timeout"
+        HTTP_USE_COMPRESSION = "http_use_compression"
+        ENDPOINT_PROBE_INTERVAL = "endpoint_probe_interval"
+        # Resilience
+        RETRY_COUNT = "retry_count"
+        RETRY_BASE_DELAY = "retry_base_delay"
+        RETRY_MAX_DELAY = "retry_max_delay"
+        CIRCUIT_BREAKER_FAILURES = "circuit_breaker_failures"
+        CIRCUIT_BREAKER_RESET_TIMEOUT = "circuit_breaker_reset_timeout"
+        SERVER_DEDUPES_WRITES = "server_dedupes_writes"
+        # Response cache
+        RESPONSE_CACHE_GROUP_TTL = "response_cache_group_ttl"
+        RESPONSE_CACHE_PAGE_TTL = "response_cache_page_ttl"
+        RESPONSE_CACHE_MAX_BYTES = "response_cache_max_bytes"
+        COMPLETION_CACHE_MAX_SIZE = "completion_cache_max_size"
+        # Search
+        SEARCH_INDEX = "search_index"
+        # Legacy cache, moved into the completion cache on load
         CACHE_PAGES = "cache_page_id_list"
         CACHE_NOS = "cache_no_list"
         CACHE_ACS = "cache_anocode_list"
 
+    # Kept per profile under `profiles.<name>` when a profile is selected
+    PROFILE_KEYS = (
+        ConfigKeys.ADDR,
+        ConfigKeys.ACCOUNT,
+        ConfigKeys.TOKEN,
+        ConfigKeys.ANOCODES,
+        ConfigKeys.NOW_ANOCODE,
+    )
+
+    DEFAULT_GROUP_PAGE_SIZE = 30
+    DEFAULT_FLOOR_PAGE_SIZE = 50
+
     DEFAULT_CONFIG_PATH = pathlib.Path(f"{os.path.expanduser('~')}/.config/anobbs_cli/config.json")
+    DEFAULT_CONFIG_LOCK_PATH = DEFAULT_CONFIG_PATH.parent / "config.json.lock"
+    DEFAULT_RESPONSE_CACHE_PATH = DEFAULT_CONFIG_PATH.parent / "response_cache.sqlite3"
+    DEFAULT_COMPLETION_CACHE_PATH = DEFAULT_CONFIG_PATH.parent / "completion_cache.sqlite3"
+    DEFAULT_RENDER_CACHE_PATH = DEFAULT_CONFIG_PATH.parent / "render_cache.sqlite3"
+    DEFAULT_MIRROR_PATH = DEFAULT_CONFIG_PATH.parent / "mirror.sqlite3"
+    DEFAULT_SEARCH_INDEX_PATH = DEFAULT_CONFIG_PATH.parent / "search_index.sqlite3"
+    DEFAULT_WRITE_JOURNAL_PATH = DEFAULT_CONFIG_PATH.parent / "write_journal.ndjson"
     DEFAULT_CONFIG = {
         # Config
         ConfigKeys.ADDR: "http://host:port",
@@ -36,11 +108,35 @@ class AnoBbsClient:
         ConfigKeys.TOKEN: "",
         ConfigKeys.ANOCODES: [],
         ConfigKeys.NOW_ANOCODE: "",
+        ConfigKeys.PROFILES: {},
         ConfigKeys.UI_USE_LINE_BORDER: False,
-        # Cache
-        ConfigKeys.CACHE_PAGES: [],
-        ConfigKeys.CACHE_NOS: [],
-        ConfigKeys.CACHE_ACS: [],
+        ConfigKeys.UI_RENDER_CACHE_ON_DISK: False,
+        # Http
+        ConfigKeys.HTTP_POOL_SIZE: HttpTransport.DEFAULT_POOL_SIZE,
+        ConfigKeys.HTTP_CONNECT_TIMEOUT: HttpTransport.DEFAULT_CONNECT_TIMEOUT,
+        ConfigKeys.HTTP_READ_TIMEOUT: HttpTransport.DEFAULT_READ_TIMEOUT,
+        ConfigKeys.HTTP_USE_COMPRESSION: True,
+        ConfigKeys.ENDPOINT_PROBE_INTERVAL: EndpointPool.DEFAULT_PROBE_INTERVAL,
+        # Resilience
+        ConfigKeys.RETRY_COUNT: RetryPolicy.DEFAULT_RETRIES,
+        ConfigKeys.RETRY_BASE_DELAY: RetryPolicy.DEFAULT_BASE_DELAY,
+        ConfigKeys.RETRY_MAX_DELAY: RetryPolicy.DEFAULT_MAX_DELAY,
+        ConfigKeys.CIRCUIT_BREAKER_FAILURES: CircuitBreaker.DEFAULT_FAILURE_THRESHOLD,
+        ConfigKeys.CIRCUIT_BREAKER_RESET_TIMEOUT: CircuitBreaker.DEFAULT_RESET_TIMEOUT,
+        # Only once the server is known to drop a second copy with the same Idempotency-Key
+        ConfigKeys.SERVER_DEDUPES_WRITES: False,
+        # Response cache
+        ConfigKeys.RESPONSE_CACHE_GROUP_TTL: 60,
+        ConfigKeys.RESPONSE_CACHE_PAGE_TTL: 600,
+        ConfigKeys.RESPONSE_CACHE_MAX_BYTES: ResponseCache.DEFAULT_MAX_BYTES,
+        ConfigKeys.COMPLETION_CACHE_MAX_SIZE: CompletionCache.DEFAULT_MAX_SIZE,
+        # Search
+        ConfigKeys.SEARCH_INDEX: True,
+    }
+    LEGACY_CACHE_KINDS = {
+        ConfigKeys.CACHE_PAGES: CompletionCache.Kinds.PAGES,
+        ConfigKeys.CACHE_NOS: CompletionCache.Kinds.NOS,
+        ConfigKeys.CACHE_ACS: CompletionCache.Kinds.ACS,
     }
 
     class AnoBbsHttpApi:
@@ -58,129 +154,478 @@ class AnoBbsClient:
         QueryPageWithFloors = "/api/v1/query_page_with_floors"
         HelloWorld = "/api/v1/hello_world"
 
-        @classmethod
-        def add_addr(cls, addr: str):
-            return [
-                setattr(cls, attr, addr + getattr(cls, attr))
-                for attr
-                in dir(cls)
-                if not attr.startswith("__") and attr != "add_addr"
-            ]
+        @staticmethod
+        def url(address: AnyStr, api: AnyStr) -> AnyStr:
+            return address.rstrip("/") + api
+
+    @classmethod
+    def __write_config_file(cls, config: dict) -> None:
+        import tempfile
 
-    def __write_config(self):
-        self.__get_config()
-        with open(self.DEFAULT_CONFIG_PATH, "w") as file:
-            file.write(json.dumps(self.__config, indent=2))
+        # Write aside and rename, a reader never sees a half written file
+        fd, tmp_path = tempfile.mkstemp(
+            dir=str(cls.DEFAULT_CONFIG_PATH.parent),
+            prefix=f".{cls.DEFAULT_CONFIG_PATH.name}.",
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(json.dumps(config, indent=2))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, cls.DEFAULT_CONFIG_PATH)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
 
     def __get_config(self) -> Optional[dict]:
         os.makedirs(self.DEFAULT_CONFIG_PATH.parent, exist_ok=True)
-        if not self.DEFAULT_CONFIG_PATH.is_file():
-            with open(self.DEFAULT_CONFIG_PATH, "w") as file:
-                file.write(json.dumps(self.DEFAULT_CONFIG, indent=2))
+        with self.__config_file_lock:
+            if not self.DEFAULT_CONFIG_PATH.is_file():
+                self.__write_config_file(self.DEFAULT_CONFIG)
+                return None
+            else:
+                with open(self.DEFAULT_CONFIG_PATH, "r") as file:
+                    config = {
+                        **self.DEFAULT_CONFIG,
+                        **json.load(file)
+                    }
+                self.__config_mtime = self.__config_file_mtime()
+                return config
+
+    @classmethod
+    def __config_file_mtime(cls) -> Optional[int]:
+        try:
+            return cls.DEFAULT_CONFIG_PATH.stat().st_mtime_ns
+        except FileNotFoundError:
             return None
-        else:
-            with open(self.DEFAULT_CONFIG_PATH, "r") as file:
-                config = {
-                    **self.DEFAULT_CONFIG,
-                    **json.load(file)
-                }
-            return config
+
+    def config_changed_on_disk(self) -> bool:
+        # Another process wrote the config file since this client last read or wrote it
+        return self.__config_file_mtime() != self.__config_mtime
+
+    def __config_path(self, key: AnyStr) -> tuple:
+        if self.__profile is not None and key in self.PROFILE_KEYS:
+            return self.ConfigKeys.PROFILES, self.__profile, key
+        return key,
+
+    def __get(self, key: AnyStr):
+        # Not copied, only for the scalar values read on every request
+        with self.__config_lock:
+            value = self.__config
+            for part in self.__config_path(key):
+                if not isinstance(value, dict) or part not in value:
+                    return self.DEFAULT_CONFIG.get(key)
+                value = value[part]
+            return value
+
+    def __set_config(self, key: AnyStr, value) -> None:
+        with self.__config_lock:
+            *parents, name = self.__config_path(key)
+            config = self.__config
+            for part in parents:
+                config = config.setdefault(part, {})
+            if name in config and config[name] == value:
+                return
+            config[name] = copy.deepcopy(value)
+            self.__config_changes[(*parents, name)] = copy.deepcopy(value)
+
+    def __pop_config(self, key: AnyStr):
+        with self.__config_lock:
+            self.__config_changes[(key,)] = _REMOVED
+            return self.__config.pop(key)
+
+    def flush_config(self) -> bool:
+        with self.__config_lock:
+            if not self.__config_changes:
+                return False
+            with self.__config_file_lock:
+                # Only our own changes are applied, keys changed by other processes survive
+                try:
+                    with open(self.DEFAULT_CONFIG_PATH, "r") as file:
+                        config = json.load(file)
+                except (FileNotFoundError, ValueError):
+                    config = copy.deepcopy(self.DEFAULT_CONFIG)
+                for (*parents, name), value in self.__config_changes.items():
+                    target = config
+                    for part in parents:
+                        if not isinstance(target.get(part), dict):
+                            target[part] = {}
+                        target = target[part]
+                    if value is _REMOVED:
+                        target.pop(name, None)
+                    else:
+                        target[name] = value
+                self.__write_config_file(config)
+                self.__config_mtime = self.__config_file_mtime()
+            logger.debug(f"Config saved: {['.'.join(path) for path in self.__config_changes]}")
+            self.__config_changes.clear()
+        return True
+
+    @contextlib.contextmanager
+    def config_session(self):
+        try:
+            yield self
+        finally:
+            self.flush_config()
+
+    def __breaker(self, address: AnyStr) -> CircuitBreaker:
+        with self.__breakers_lock:
+            breaker = self.__breakers.get(address)
+            if breaker is None:
+                breaker = self.__breakers[address] = CircuitBreaker(
+                    address,
+                    failure_threshold=self.__get(self.ConfigKeys.CIRCUIT_BREAKER_FAILURES),
+                    reset_timeout=self.__get(self.ConfigKeys.CIRCUIT_BREAKER_RESET_TIMEOUT),
+                )
+            return breaker
 
     @staticmethod
+    def __parse_response(api: AnyStr, res: "requests.Response"):
+        if res.status_code != 200:
+            raise ServerError(api, res.status_code)
+        try:
+            data = res.json()
+        except ValueError:
+            raise ApiError(api, None, "not a JSON response")
+        if data.get("code", 1) != 0:
+            raise ApiError(
+                api,
+                data.get("code"),
+                data.get("msg") or data.get("message") or json.dumps(data, ensure_ascii=False),
+            )
+        return data.get("data")
+
+    def __send_once(
+            self,
+            api: AnyStr,
+            method: AnyStr,
+            data: Optional[dict],
+            read: bool,
+            timeout: Optional[tuple],
+            headers: Optional[dict],
+    ):
+        endpoints = self.endpoints
+        addresses = endpoints.read_order() if read else endpoints.write_order()
+        error: Optional[AnoBbsError] = None
+        for address in addresses:
+            breaker = self.__breaker(address)
+            if not breaker.allow():
+                continue
+            try:
+                # requests' errors are OSErrors, the module itself is only imported by the transport
+                res = self.__transport.request(
+                    method,
+                    self.AnoBbsHttpApi.url(address, api),
+                    data,
+                    timeout=timeout,
+                    headers=headers,
+                )
+            except OSError as cause:
+                breaker.failure()
+                endpoints.fail(address, cause)
+                error = TransportError(api, cause, sent=not self.__transport.never_sent(cause))
+                continue
+            if res.status_code >= 500 or res.status_code == 429:
+                retry_after = res.headers.get("Retry-After", "")
+                error = ServerError(
+                    api,
+                    res.status_code,
+                    float(retry_after) if retry_after.replace(".", "", 1).isdigit() else None,
+                )
+                if res.status_code == 429:
+                    # Busy, not down
+                    breaker.success()
+                else:
+                    breaker.failure()
+                    endpoints.fail(address, f"HTTP {res.status_code}")
+                continue
+            breaker.success()
+            endpoints.observe(address)
+            self.__last_answer_at = time.monotonic()
+            return self.__parse_response(api, res)
+        if error is None:
+            raise CircuitOpenError(api, min(self.__breaker(address).retry_after() for address in addresses))
+        raise error
+
     def __send_request(
+            self,
             api: AnyStr,
             method: AnyStr,
             data: Optional[dict] = None,
+            read: bool = False,
+            idempotent: Optional[bool] = None,
+            timeout: Optional[float] = None,
+            headers: Optional[dict] = None,
+            retry: bool = True,
     ):
         method = method.lower()
-        if method == "post":
-            res = requests.post(api, json=data)
-        elif method == "get":
-            res = requests.get(api)
-        else:
-            return None
-
-        if res.status_code == 200:
-            data = res.json()
-            if data.get("code", 1) == 0:
-                return data.get("data")
-            else:
-                logger.error(f"{api} {method.upper()} {data}")
-        return None
+        if method not in ("post", "get"):
+            raise ValueError(f"Unsupported method: {method}")
+        # A write is only sent again when the server can tell the copies apart,
+        # or when it can not have received the first one
+        if idempotent is None:
+            idempotent = read
+        retries = self.__retry_policy.retries if retry else 0
+        if timeout is not None:
+            timeout = (self.__transport.timeout[0], timeout)
+        for attempt in range(retries + 1):
+            try:
+                return self.__send_once(api, method, data, read, timeout, headers)
+            except AnoBbsError as error:
+                resendable = idempotent or (isinstance(error, TransportError) and error.unsent)
+                if not error.retryable or not resendable or attempt == retries:
+                    raise
+                delay = self.__retry_policy.delay(attempt, getattr(error, "retry_after", None))
+                logger.warning(f"{error}, retry {attempt + 1}/{retries} in {delay:.2f}s")
+                time.sleep(delay)
 
-    @staticmethod
     def _post(
+            self,
             api: AnyStr,
             data: Optional[dict] = None,
+            read: bool = False,
+            **options,
     ):
-        return AnoBbsClient.__send_request(api, "post", data)
+        return self.__send_request(api, "post", data, read=read, **options)
 
-    @staticmethod
-    def _get(api: AnyStr) -> Optional[dict]:
-        return AnoBbsClient.__send_request(api, "get")
+    def _get(self, api: AnyStr, read: bool = True, **options) -> Optional[dict]:
+        return self.__send_request(api, "get", read=read, **options)
+
+    def __token(self) -> AnyStr:
+        token = self.__get(self.ConfigKeys.TOKEN)
+        if not token:
+            raise NotLoggedInError("No token, login first")
+        return token
 
-    def __init__(self):
+    def __anocode(self) -> AnyStr:
+        ac = self.__get(self.ConfigKeys.NOW_ANOCODE)
+        if not ac:
+            raise NotLoggedInError("No anocode selected, create one or login again")
+        return ac
+
+    def __probe(self, address: AnyStr) -> bool:
+        connect_timeout = self.__transport.timeout[0]
+        res = self.__transport.request(
+            "get",
+            self.AnoBbsHttpApi.url(address, self.AnoBbsHttpApi.HelloWorld),
+            timeout=(connect_timeout, connect_timeout),
+        )
+        return res.status_code == 200 and res.json().get("code", 1) == 0
+
+    def __query_with_cache(
+            self,
+            api: AnyStr,
+            data: dict,
+            endpoint: AnyStr,
+            target: AnyStr,
+            ttl: float,
+            timeout: Optional[float] = None,
+    ) -> tuple:
+        # (answer, fetched): `fetched` is False when the answer came from the cache
+        address = self.address
+        key = (address, endpoint, target, data["page_size"], data["page_index"])
+        res = self.__response_cache.get(*key, ttl=ttl, ignore_ttl=self.offline)
+        if res is not None:
+            logger.debug(f"Cache hit: {key}")
+            return res, False
+        if self.offline:
+            raise NotCachedError(f"Not in cache, offline mode: {endpoint} {target} {data['page_index']}")
+
+        res = self._post(api, data, read=True, timeout=timeout)
+        if res:
+            if endpoint == ResponseCache.Endpoints.GROUP:
+                self.__response_cache.sync_versions(address, ResponseCache.Endpoints.PAGE, {
+                    page["id"]: str(page.get("floor_count"))
+                    for page
+                    in res["pages"]
+                })
+                version = None
+            else:
+                version = str(res.get("floors_count"))
+            self.__response_cache.put(*key, res, version=version)
+        return res, True
+
+    def __init__(self, offline: bool = False, profile: Optional[AnyStr] = None):
+        self.offline = offline
+        self.__profile = profile
+        self.__config_lock = threading.RLock()
+        self.__config_file_lock = FileLock(self.DEFAULT_CONFIG_LOCK_PATH)
+        self.__config_changes = {}
+        self.__config_mtime: Optional[int] = None
         self.__config = self.__get_config()
         if self.__config is None:
             raise RuntimeError(f"Config file not be found: {self.DEFAULT_CONFIG_PATH}")
-        else:
-            self.AnoBbsHttpApi.add_addr(self.__config[self.ConfigKeys.ADDR])
+        self.__transport = HttpTransport(
+            pool_size=self.__config[self.ConfigKeys.HTTP_POOL_SIZE],
+            connect_timeout=self.__config[self.ConfigKeys.HTTP_CONNECT_TIMEOUT],
+            read_timeout=self.__config[self.ConfigKeys.HTTP_READ_TIMEOUT],
+            use_compression=self.__config[self.ConfigKeys.HTTP_USE_COMPRESSION],
+        )
+        self.__response_cache = ResponseCache(
+            self.DEFAULT_RESPONSE_CACHE_PATH,
+            max_bytes=self.__config[self.ConfigKeys.RESPONSE_CACHE_MAX_BYTES],
+        )
+        # Ids of one server mean nothing on another, each profile completes from its own
+        self.__completion_cache = CompletionCache(
+            self.DEFAULT_COMPLETION_CACHE_PATH
+            if profile is None
+            else self.DEFAULT_COMPLETION_CACHE_PATH.with_name(f"completion_cache.{profile}.sqlite3"),
+            max_size=self.__config[self.ConfigKeys.COMPLETION_CACHE_MAX_SIZE],
+            index=CompletionIndex.for_profile(profile),
+        )
+        # Floor numbers and anocodes of one server mean nothing on another either
+        self.__search_index = SearchIndex(
+            self.DEFAULT_SEARCH_INDEX_PATH
+            if profile is None
+            else self.DEFAULT_SEARCH_INDEX_PATH.with_name(f"search_index.{profile}.sqlite3")
+        )
+        # Each profile queues for its own server
+        self.__journal = WriteJournal(
+            self.DEFAULT_WRITE_JOURNAL_PATH
+            if profile is None
+            else self.DEFAULT_WRITE_JOURNAL_PATH.with_name(f"write_journal.{profile}.ndjson")
+        )
+        self.__endpoints: Optional[EndpointPool] = None
+        self.__endpoints_lock = threading.Lock()
+        self.__breakers = {}
+        self.__last_answer_at: Optional[float] = None
+        self.__breakers_lock = threading.Lock()
+        self.__retry_policy = RetryPolicy(
+            retries=self.__config[self.ConfigKeys.RETRY_COUNT],
+            base_delay=self.__config[self.ConfigKeys.RETRY_BASE_DELAY],
+            max_delay=self.__config[self.ConfigKeys.RETRY_MAX_DELAY],
+        )
+        self.__migrate_legacy_cache()
+        # Scripts that never flush explicitly still keep their login
+        atexit.register(self.flush_config)
+
+    def __migrate_legacy_cache(self) -> None:
+        # The legacy lists were the default setup's
+        legacy_keys = [key for key in self.LEGACY_CACHE_KINDS if key in self.__config]
+        if not legacy_keys or self.__profile is not None:
+            return
+        for key in legacy_keys:
+            self.__completion_cache.add(self.LEGACY_CACHE_KINDS[key], self.__pop_config(key))
+        logger.debug(f"Moved {legacy_keys} into {self.DEFAULT_COMPLETION_CACHE_PATH}")
+
+    @property
+    def profile(self) -> Optional[AnyStr]:
+        return self.__profile
+
+    @property
+    def addresses(self) -> List[AnyStr]:
+        # `address` is one address or a list of replicas of the same board, the primary first
+        address = self.__get(self.ConfigKeys.ADDR)
+        if isinstance(address, str):
+            return [address]
+        return list(address) or [self.DEFAULT_CONFIG[self.ConfigKeys.ADDR]]
+
+    @property
+    def address(self) -> AnyStr:
+        # The primary, it also names the board in the caches whichever replica answered
+        return self.addresses[0]
+
+    @property
+    def endpoints(self) -> EndpointPool:
+        addresses = self.addresses
+        with self.__endpoints_lock:
+            if self.__endpoints is None or self.__endpoints.addresses != addresses:
+                if self.__endpoints is not None:
+                    self.__endpoints.close()
+                self.__endpoints = EndpointPool(
+                    addresses,
+                    probe=self.__probe,
+                    probe_interval=self.__get(self.ConfigKeys.ENDPOINT_PROBE_INTERVAL),
+                )
+            return self.__endpoints
+
+    @property
+    def transport(self) -> HttpTransport:
+        return self.__transport
+
+    @property
+    def response_cache(self) -> ResponseCache:
+        return self.__response_cache
+
+    @property
+    def completion_cache(self) -> CompletionCache:
+        return self.__completion_cache
+
+    @property
+    def search_index(self) -> SearchIndex:
+        return self.__search_index
+
+    @property
+    def journal(self) -> WriteJournal:
+        return self.__journal
+
+    @property
+    def last_answer_at(self) -> Optional[float]:
+        # time.monotonic() of the last answer from the server, it was up then
+        return self.__last_answer_at
+
+    def close(self) -> None:
+        with self.__endpoints_lock:
+            if self.__endpoints is not None:
+                self.__endpoints.close()
+        self.__transport.close()
+        self.__response_cache.close()
+        self.__completion_cache.close()
+        self.__search_index.close()
+
+    def config_value(self, key: AnyStr):
+        with self.__config_lock:
+            return copy.deepcopy(self.__get(key))
 
     @property
     def config(self):
-        config = copy.deepcopy(self.__config)
-        for key in list(config.keys()):
-            if key.startswith("cache_"):
-                config.pop(key)
+        with self.__config_lock:
+            config = copy.deepcopy(self.__config)
+            for key in list(config.keys()):
+                if key.startswith("cache_"):
+                    config.pop(key)
+            if self.__profile is not None:
+                # What this client uses, the selected profile over the shared settings
+                config.update({key: copy.deepcopy(self.__get(key)) for key in self.PROFILE_KEYS})
         return config
 
-    @property
-    def cache(self):
-        cache = copy.deepcopy(self.__config)
-        for key in list(cache.keys()):
-            if not key.startswith("cache_"):
-                cache.pop(key)
-        return cache
-
-    def hello_world(self) -> bool:
+    def complete(self, kind: AnyStr, prefix: AnyStr = "") -> List[AnyStr]:
+        return self.__completion_cache.lookup(kind, prefix)
+
+    def hello_world(self, timeout: Optional[float] = None) -> bool:
+        # A health check answers at once, it is not retried
         try:
-            return self._get(self.AnoBbsHttpApi.HelloWorld) is not None
+            return self._get(self.AnoBbsHttpApi.HelloWorld, timeout=timeout, retry=False) is not None
         except Exception as error:
             logger.error(error)
             return False
 
-    def create_account(self, ic: AnyStr) -> Optional[AnyStr]:
-        res = self._post(self.AnoBbsHttpApi.CreateAccount, {"invitation_code": ic})
+    def create_account(self, ic: AnyStr, timeout: Optional[float] = None) -> Optional[AnyStr]:
+        res = self._post(self.AnoBbsHttpApi.CreateAccount, {"invitation_code": ic}, timeout=timeout)
         if res:
-            self.__config[self.ConfigKeys.ACCOUNT] = res
-            self.login()
-            self.__write_config()
+            self.__set_config(self.ConfigKeys.ACCOUNT, res)
+            self.login(timeout=timeout)
             return res
         return None
 
-    def create_ic(self) -> Optional[AnyStr]:
-        token = self.__config.get(self.ConfigKeys.TOKEN)
-        if not token:
-            return None
-        return self._post(self.AnoBbsHttpApi.CreateInvitationCode, {"token": token})
+    def create_ic(self, timeout: Optional[float] = None) -> Optional[AnyStr]:
+        return self._post(self.AnoBbsHttpApi.CreateInvitationCode, {"token": self.__token()}, timeout=timeout)
 
-    def create_ac(self) -> Optional[AnyStr]:
-        token = self.__config.get(self.ConfigKeys.TOKEN)
-        if not token:
-            return None
-        res = self._post(self.AnoBbsHttpApi.CreateAnoCode, {"token": token})
+    def create_ac(self, timeout: Optional[float] = None) -> Optional[AnyStr]:
+        res = self._post(self.AnoBbsHttpApi.CreateAnoCode, {"token": self.__token()}, timeout=timeout)
         if res:
-            self.query_account()
+            self.query_account(timeout=timeout)
             return res
         return None
 
-    def login(self) -> Optional[AnyStr]:
+    def login(self, timeout: Optional[float] = None) -> Optional[AnyStr]:
         res = self._post(self.AnoBbsHttpApi.Login, {
-            "account_id": self.__config.get(self.ConfigKeys.ACCOUNT)
-        })
+            "account_id": self.__get(self.ConfigKeys.ACCOUNT)
+        }, timeout=timeout)
         if res:
-            self.__config[self.ConfigKeys.TOKEN] = res
-            account = self.query_account()
+            self.__set_config(self.ConfigKeys.TOKEN, res)
+            account = self.query_account(timeout=timeout)
             if account:
                 ac_list = [
                     ac_obj.get("id")
@@ -188,149 +633,258 @@ class AnoBbsClient:
                     in account.get("ac_list", [])
                     if not ac_obj.get("is_blocked")
                 ]
-                self.__config[self.ConfigKeys.ANOCODES] = ac_list
+                self.__set_config(self.ConfigKeys.ANOCODES, ac_list)
                 if len(ac_list) > 0:
                     default_anocode = ac_list[0]
-                    self.__config[self.ConfigKeys.NOW_ANOCODE] = default_anocode
+                    self.__set_config(self.ConfigKeys.NOW_ANOCODE, default_anocode)
                     logger.info(
                         f"You can select default anocode in {self.DEFAULT_CONFIG_PATH}\n"
                         f"Now anocode: {default_anocode}"
                     )
-            self.__write_config()
             return res
         return None
 
-    def list_group(self) -> Optional[List[AnyStr]]:
-        return self._get(self.AnoBbsHttpApi.GroupList)
+    def list_group(self, timeout: Optional[float] = None) -> Optional[List[AnyStr]]:
+        return self._get(self.AnoBbsHttpApi.GroupList, read=True, timeout=timeout)
 
-    def append_page(self, page_id: AnyStr, content: AnyStr) -> Optional[dict]:
-        token = self.__config.get(self.ConfigKeys.TOKEN)
-        if not token:
-            return None
+    @staticmethod
+    def __idempotency_headers(idempotency_key: Optional[AnyStr]) -> Optional[dict]:
+        return {"Idempotency-Key": idempotency_key} if idempotency_key else None
 
-        ac = self.__config.get(self.ConfigKeys.NOW_ANOCODE)
-        if not ac:
-            return None
+    def __write_idempotent(self, idempotency_key: Optional[AnyStr]) -> bool:
+        # The key is always sent, it only makes a write safe to resend when the server honours it
+        return idempotency_key is not None and bool(self.__get(self.ConfigKeys.SERVER_DEDUPES_WRITES))
 
-        return self._post(self.AnoBbsHttpApi.AppendPage, {
-            "page_id": page_id,
-            "token": token,
-            "ano_code": ac,
-            "content": content,
-        })
+    def write_resendable(self, error: AnoBbsError, idempotency_key: Optional[AnyStr] = None) -> bool:
+        # A failed post or append is kept to send later only when that can not make a second copy
+        return error.transient and (error.unsent or self.__write_idempotent(idempotency_key))
 
-    def post_page(self, content: AnyStr, group_name: AnyStr = "all") -> Optional[dict]:
-        token = self.__config.get(self.ConfigKeys.TOKEN)
-        if not token:
-            return None
-        ac = self.__config.get(self.ConfigKeys.NOW_ANOCODE)
-        if not ac:
-            return None
+    def append_page(
+            self,
+            page_id: AnyStr,
+            content: AnyStr,
+            idempotency_key: Optional[AnyStr] = None,
+            timeout: Optional[float] = None,
+            retry: bool = True,
+    ) -> Optional[dict]:
+        res = self._post(
+            self.AnoBbsHttpApi.AppendPage,
+            {
+                "page_id": page_id,
+                "token": self.__token(),
+                "ano_code": self.__anocode(),
+                "content": content,
+            },
+            idempotent=self.__write_idempotent(idempotency_key),
+            headers=self.__idempotency_headers(idempotency_key),
+            timeout=timeout,
+            retry=retry,
+        )
+        if res:
+            address = self.address
+            self.__response_cache.invalidate(address, ResponseCache.Endpoints.PAGE, page_id)
+            self.__response_cache.invalidate(address, ResponseCache.Endpoints.GROUP)
+        return res
 
-        return self._post(self.AnoBbsHttpApi.PostPage, {
-            "token": token,
-            "ano_code": ac,
-            "content": content,
-            "group_name": group_name,
-        })
+    def post_page(
+            self,
+            content: AnyStr,
+            group_name: AnyStr = "all",
+            idempotency_key: Optional[AnyStr] = None,
+            timeout: Optional[float] = None,
+            retry: bool = True,
+    ) -> Optional[dict]:
+        res = self._post(
+            self.AnoBbsHttpApi.PostPage,
+            {
+                "token": self.__token(),
+                "ano_code": self.__anocode(),
+                "content": content,
+                "group_name": group_name,
+            },
+            idempotent=self.__write_idempotent(idempotency_key),
+            headers=self.__idempotency_headers(idempotency_key),
+            timeout=timeout,
+            retry=retry,
+        )
+        if res:
+            self.__response_cache.invalidate(self.address, ResponseCache.Endpoints.GROUP)
+        return res
 
     def query_group_with_pages(
             self,
             group_name: AnyStr = "all",
-            page_size: int = 30,
+            page_size: int = DEFAULT_GROUP_PAGE_SIZE,
             page_index: int = 1,
+            max_age: Optional[float] = None,
+            timeout: Optional[float] = None,
     ) -> Optional[dict]:
-        group = self._post(self.AnoBbsHttpApi.QueryGroupWithPages, {
-            "group_name": group_name,
-            "page_size": page_size,
-            "page_index": page_index,
-        })
-        if group:
-            self.__config[self.ConfigKeys.CACHE_PAGES] = list(
-                set(self.__config[self.ConfigKeys.CACHE_PAGES]).union(
-                    [
-                        page["id"]
-                        for page
-                        in group["pages"]
-                    ])
-            )
-            self.__config[self.ConfigKeys.CACHE_ACS] = list(
-                set(self.__config[self.ConfigKeys.CACHE_ACS]).union(
-                    [
-                        page["owner_ac"]
-                        for page
-                        in group["pages"]
-                    ])
-            )
-            self.__write_config()
+        group, fetched = self.__query_with_cache(
+            self.AnoBbsHttpApi.QueryGroupWithPages,
+            {
+                "group_name": group_name,
+                "page_size": page_size,
+                "page_index": page_index,
+            },
+            ResponseCache.Endpoints.GROUP,
+            group_name,
+            self.__get(self.ConfigKeys.RESPONSE_CACHE_GROUP_TTL) if max_age is None else max_age,
+            timeout=timeout,
+        )
+        if group and fetched:
+            # A cached answer was recorded and indexed when it was fetched
+            self.__completion_cache.add(CompletionCache.Kinds.PAGES, [page["id"] for page in group["pages"]])
+            self.__completion_cache.add(CompletionCache.Kinds.ACS, [page["owner_ac"] for page in group["pages"]])
+            if self.__get(self.ConfigKeys.SEARCH_INDEX):
+                self.__search_index.add_group({"name": group_name, **group})
         return group
 
     def query_page_with_floor(
             self,
             page_id: AnyStr,
-            page_size: int = 50,
+            page_size: int = DEFAULT_FLOOR_PAGE_SIZE,
             page_index: int = 1,
+            max_age: Optional[float] = None,
+            timeout: Optional[float] = None,
     ) -> Optional[dict]:
-        page = self._post(self.AnoBbsHttpApi.QueryPageWithFloors, {
-            "page_id": page_id,
-            "page_size": page_size,
-            "page_index": page_index,
-        })
-        if page:
-            self.__config[self.ConfigKeys.CACHE_ACS] = list(
-                set(self.__config[self.ConfigKeys.CACHE_ACS]).union(
-                    [
-                        floor["owner_ac"]
-                        for floor
-                        in page["floors"]
-                    ])
-            )
-            self.__config[self.ConfigKeys.CACHE_NOS] = list(
-                set(self.__config[self.ConfigKeys.CACHE_NOS]).union(
-                    [
-                        floor["no"]
-                        for floor
-                        in page["floors"]
-                    ])
-            )
-            self.__write_config()
+        page, fetched = self.__query_with_cache(
+            self.AnoBbsHttpApi.QueryPageWithFloors,
+            {
+                "page_id": page_id,
+                "page_size": page_size,
+                "page_index": page_index,
+            },
+            ResponseCache.Endpoints.PAGE,
+            page_id,
+            self.__get(self.ConfigKeys.RESPONSE_CACHE_PAGE_TTL) if max_age is None else max_age,
+            timeout=timeout,
+        )
+        if page and fetched:
+            self.__completion_cache.add(CompletionCache.Kinds.ACS, [floor["owner_ac"] for floor in page["floors"]])
+            self.__completion_cache.add(CompletionCache.Kinds.NOS, [floor["no"] for floor in page["floors"]])
+            if self.__get(self.ConfigKeys.SEARCH_INDEX):
+                self.__search_index.add_floors(page_id, page["floors"])
         return page
 
-    def query_account(self) -> Optional[dict]:
-        token = self.__config.get(self.ConfigKeys.TOKEN)
-        if not token:
-            return None
+    def __iter_items(
+            self,
+            fetch: Callable[[int, int], Optional[dict]],
+            items_key: AnyStr,
+            count_key: AnyStr,
+            tuner: PageSizeTuner,
+    ) -> Iterator[dict]:
+        offset = 0
+        while True:
+            page_size = tuner.aligned_page_size(offset)
+            page_index = offset // page_size + 1
+            skip = offset - (page_index - 1) * page_size
+
+            start = time.monotonic()
+            res = fetch(page_size, page_index)
+            latency = time.monotonic() - start
+            if not res:
+                return
+
+            items = res[items_key]
+            tuner.observe(len(items), latency, self.__transport.last_response_bytes)
+            items = items[skip:]
+            yield from items
+
+            offset += len(items)
+            if not items or offset >= res.get(count_key, 0):
+                return
+
+    def iter_group_pages(
+            self,
+            group_name: AnyStr = "all",
+            tuner: Optional[PageSizeTuner] = None,
+            max_age: Optional[float] = None,
+    ) -> Iterator[dict]:
+        return self.__iter_items(
+            lambda page_size, page_index: self.query_group_with_pages(group_name, page_size, page_index, max_age),
+            "pages",
+            "pages_count",
+            tuner or PageSizeTuner(initial_size=self.DEFAULT_GROUP_PAGE_SIZE),
+        )
+
+    def iter_floors(
+            self,
+            page_id: AnyStr,
+            tuner: Optional[PageSizeTuner] = None,
+            max_age: Optional[float] = None,
+    ) -> Iterator[dict]:
+        return self.__iter_items(
+            lambda page_size, page_index: self.query_page_with_floor(page_id, page_size, page_index, max_age),
+            "floors",
+            "floors_count",
+            tuner or PageSizeTuner(initial_size=self.DEFAULT_FLOOR_PAGE_SIZE),
+        )
+
+    def query_account(self, timeout: Optional[float] = None) -> Optional[dict]:
         return self._post(self.AnoBbsHttpApi.QueryAccount, {
-            "token": token,
-        })
-
-    def query_account_tree(self) -> Optional[AnyStr]:
-        token = self.__config.get(self.ConfigKeys.TOKEN)
-        if not token:
-            return None
+            "token": self.__token(),
+        }, read=True, timeout=timeout)
 
+    def query_account_tree(self, timeout: Optional[float] = None) -> Optional[AnyStr]:
         return self._post(self.AnoBbsHttpApi.QueryAccountTree, {
-            "token": token,
-        })
+            "token": self.__token(),
+        }, read=True, timeout=timeout)
 
-    def block_ac_by_floor_no(self, floor_no: AnyStr) -> Optional[AnyStr]:
-        token = self.__config.get(self.ConfigKeys.TOKEN)
-        if not token:
-            return None
-        return self._post(self.AnoBbsHttpApi.BlockAnoCodeByFloorNo, {"token": token, "floor_no": floor_no})
+    def account_tree(self, timeout: Optional[float] = None) -> Optional[AccountTree]:
+        res = self.query_account_tree(timeout=timeout)
+        return AccountTree.parse(res) if res else None
+
+    def block_ac_by_floor_no(self, floor_no: AnyStr, timeout: Optional[float] = None) -> Optional[AnyStr]:
+        return self._post(
+            self.AnoBbsHttpApi.BlockAnoCodeByFloorNo,
+            {"token": self.__token(), "floor_no": floor_no},
+            timeout=timeout,
+        )
 
     def set_account(self, account: AnyStr) -> None:
-        self.__config[self.ConfigKeys.ACCOUNT] = account
-        self.__write_config()
+        self.__set_config(self.ConfigKeys.ACCOUNT, account)
+
+    def set_service_address(self, address) -> None:
+        # One address, or several replicas of the same board with the primary first
+        if not isinstance(address, str):
+            address = list(address)
+            if len(address) == 1:
+                address = address[0]
+        self.__set_config(self.ConfigKeys.ADDR, address)
+
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(create: bool = True, profile: Optional[AnyStr] = None) -> Optional[AnoBbsClient]:
+    # Built on first use, so importing the library does no file or network I/O; one client per profile
+    client = _clients.get(profile)
+    if client is None and create:
+        with _clients_lock:
+            client = _clients.get(profile)
+            if client is None:
+                client = _clients[profile] = AnoBbsClient(profile=profile)
+    return client
+
+
+def all_clients() -> List[AnoBbsClient]:
+    with _clients_lock:
+        return list(_clients.values())
+
 
-    def set_service_address(self, address: AnyStr) -> None:
-        self.__config[self.ConfigKeys.ADDR] = address
-        self.__write_config()
+def drop_clients() -> None:
+    # Flushed and closed, the next get_client() builds them again from the config file
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.flush_config()
+        client.close()
 
 
-try:
-    ano_bbs_client = AnoBbsClient()
-except RuntimeError as err:
-    logging.warning(f"Please edit config file: {AnoBbsClient.DEFAULT_CONFIG_PATH}")
-    logging.error(err)
-    exit(1)
+def __getattr__(name):
+    if name == "ano_bbs_client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
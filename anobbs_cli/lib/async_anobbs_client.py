@@ -0,0 +1,176 @@
+__all__ = [
+    "AsyncAnoBbsClient",
+]
+
+import asyncio
+import functools
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, AnyStr, List, Iterable
+
+from .anobbs_client import AnoBbsClient
+
+logger = logging.getLogger("AsyncAnoBbsClient")
+
+
+class AsyncAnoBbsClient:
+    def __init__(self, client: AnoBbsClient, concurrency: Optional[int] = None):
+        self.__client = client
+        # More workers than pooled connections would only make urllib3 drop the extra ones
+        self.__concurrency = max(1, concurrency or client.transport.pool_size)
+        self.__executor = ThreadPoolExecutor(
+            max_workers=self.__concurrency,
+            thread_name_prefix="AsyncAnoBbsClient",
+        )
+
+    @property
+    def client(self) -> AnoBbsClient:
+        return self.__client
+
+    @property
+    def concurrency(self) -> int:
+        return self.__concurrency
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, functools.partial(func, *args, **kwargs))
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        self.close()
+
+    async def hello_world(self) -> bool:
+        return await self._run(self.__client.hello_world)
+
+    async def create_account(self, ic: AnyStr) -> Optional[AnyStr]:
+        return await self._run(self.__client.create_account, ic)
+
+    async def create_ic(self) -> Optional[AnyStr]:
+        return await self._run(self.__client.create_ic)
+
+    async def create_ac(self) -> Optional[AnyStr]:
+        return await self._run(self.__client.create_ac)
+
+    async def login(self) -> Optional[AnyStr]:
+        return await self._run(self.__client.login)
+
+    async def list_group(self) -> Optional[List[AnyStr]]:
+        return await self._run(self.__client.list_group)
+
+    async def append_page(
+            self,
+            page_id: AnyStr,
+            content: AnyStr,
+            idempotency_key: Optional[AnyStr] = None,
+            timeout: Optional[float] = None,
+            retry: bool = True,
+    ) -> Optional[dict]:
+        return await self._run(
+            self.__client.append_page,
+            page_id,
+            content,
+            idempotency_key=idempotency_key,
+            timeout=timeout,
+            retry=retry,
+        )
+
+    async def post_page(
+            self,
+            content: AnyStr,
+            group_name: AnyStr = "all",
+            idempotency_key: Optional[AnyStr] = None,
+            timeout: Optional[float] = None,
+            retry: bool = True,
+    ) -> Optional[dict]:
+        return await self._run(
+            self.__client.post_page,
+            content,
+            group_name,
+            idempotency_key=idempotency_key,
+            timeout=timeout,
+            retry=retry,
+        )
+
+    async def query_group_with_pages(
+            self,
+            group_name: AnyStr = "all",
+            page_size: int = AnoBbsClient.DEFAULT_GROUP_PAGE_SIZE,
+            page_index: int = 1,
+    ) -> Optional[dict]:
+        return await self._run(self.__client.query_group_with_pages, group_name, page_size, page_index)
+
+    async def query_page_with_floor(
+            self,
+            page_id: AnyStr,
+            page_size: int = AnoBbsClient.DEFAULT_FLOOR_PAGE_SIZE,
+            page_index: int = 1,
+    ) -> Optional[dict]:
+        return await self._run(self.__client.query_page_with_floor, page_id, page_size, page_index)
+
+    async def query_account(self) -> Optional[dict]:
+        return await self._run(self.__client.query_account)
+
+    async def query_account_tree(self) -> Optional[AnyStr]:
+        return await self._run(self.__client.query_account_tree)
+
+    async def block_ac_by_floor_no(self, floor_no: AnyStr) -> Optional[AnyStr]:
+        return await self._run(self.__client.block_ac_by_floor_no, floor_no)
+
+    async def _gather_bounded(self, coroutine_factory, keys: Iterable) -> List:
+        semaphore = asyncio.Semaphore(self.__concurrency)
+
+        async def bounded(key):
+            async with semaphore:
+                return await coroutine_factory(key)
+
+        return await asyncio.gather(*[bounded(key) for key in keys])
+
+    async def query_group_pages(
+            self,
+            page_indexes: Iterable[int],
+            group_name: AnyStr = "all",
+            page_size: int = AnoBbsClient.DEFAULT_GROUP_PAGE_SIZE,
+    ) -> List[Optional[dict]]:
+        return await self._gather_bounded(
+            lambda page_index: self.query_group_with_pages(group_name, page_size, page_index),
+            page_indexes,
+        )
+
+    async def query_page_floors(
+            self,
+            page_id: AnyStr,
+            page_indexes: Iterable[int],
+            page_size: int = AnoBbsClient.DEFAULT_FLOOR_PAGE_SIZE,
+    ) -> List[Optional[dict]]:
+        return await self._gather_bounded(
+            lambda page_index: self.query_page_with_floor(page_id, page_size, page_index),
+            page_indexes,
+        )
+
+    async def query_page_with_all_floors(
+            self,
+            page_id: AnyStr,
+            page_size: int = AnoBbsClient.DEFAULT_FLOOR_PAGE_SIZE,
+    ) -> Optional[dict]:
+        first = await self.query_page_with_floor(page_id, page_size, 1)
+        if not first:
+            return None
+        pages_count = math.ceil(first.get("floors_count", 0) / page_size)
+        rest = await self.query_page_floors(page_id, range(2, pages_count + 1), page_size)
+
+        floors = list(first["floors"])
+        for page_index, res in enumerate(rest, start=2):
+            if res is None:
+                logger.error(f"Failed to fetch floors of {page_id}, page index: {page_index}")
+                return None
+            floors.extend(res["floors"])
+        return {
+            **first,
+            "floors": floors,
+        }
@@ -0,0 +1,247 @@
+__all__ = [
+    "BulkItem",
+    "BulkStats",
+    "BulkWriter",
+    "read_items",
+]
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional, AnyStr, List, Callable, Iterable, Iterator
+
+from .anobbs_client import AnoBbsClient
+from .errors import AnoBbsError, ServerError
+from .resilience import AimdRateLimiter
+
+logger = logging.getLogger("BulkWriter")
+
+
+class BulkItem:
+    POST = "post"
+    APPEND = "append"
+
+    def __init__(
+            self,
+            index: int,
+            kind: AnyStr,
+            content: AnyStr,
+            page_id: Optional[AnyStr] = None,
+            group_name: AnyStr = "all",
+            idempotency_key: Optional[AnyStr] = None,
+    ):
+        self.index = index
+        self.kind = kind
+        self.content = content
+        self.page_id = page_id
+        self.group_name = group_name
+        self.idempotency_key = idempotency_key
+        # pending, ok, failed, skipped, or unknown: failed after it may have reached the server
+        self.status = "pending"
+        self.result = None
+        self.error: Optional[AnyStr] = None
+        # Failed for now but worth sending again later: it did not reach the server
+        self.transient = False
+        self.attempts = 0
+        self.latency = 0.0
+
+    @property
+    def queued(self) -> bool:
+        # Still to be sent: failed before reaching the server, or never tried
+        return self.status == "skipped" or (self.status == "failed" and self.transient)
+
+    @property
+    def lane(self):
+        # Floors of one thread keep their order, new threads have nothing to wait for
+        return self.page_id if self.kind == self.APPEND else ("post", self.index)
+
+    def as_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "kind": self.kind,
+            "status": self.status,
+            "page_id": self.page_id,
+            "group_name": self.group_name if self.kind == self.POST else None,
+            "result": self.result,
+            "error": self.error,
+            "attempts": self.attempts,
+            "latency": round(self.latency, 3),
+        }
+
+
+def read_items(
+        lines: Iterable[AnyStr],
+        kind: AnyStr,
+        page_id: Optional[AnyStr] = None,
+        group_name: AnyStr = "all",
+) -> Iterator[BulkItem]:
+    # NDJSON objects with a `content` (and optionally `page_id`, `group_name`, `idempotency_key`),
+    # any other non blank line is the content itself
+    index = 0
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        record = None
+        if line.lstrip().startswith("{"):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                pass
+        if isinstance(record, dict):
+            if not isinstance(record.get("content"), str):
+                raise ValueError(f"Line {number}: no content")
+            item = BulkItem(
+                index,
+                kind,
+                record["content"],
+                page_id=record.get("page_id", page_id),
+                group_name=record.get("group_name", record.get("group", group_name)),
+                idempotency_key=record.get("idempotency_key"),
+            )
+        else:
+            item = BulkItem(index, kind, line, page_id=page_id, group_name=group_name)
+        if kind == BulkItem.APPEND and not item.page_id:
+            raise ValueError(f"Line {number}: no page_id to append to")
+        index += 1
+        yield item
+
+
+class BulkStats:
+    def __init__(self, items: int = 0):
+        self.items = items
+        self.ok = 0
+        self.failed = 0
+        self.unknown = 0
+        self.skipped = 0
+        self.rate = 0.0
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def __str__(self):
+        return (
+            f"{self.ok}/{self.items} ok, failed {self.failed}, unknown {self.unknown}, skipped {self.skipped}"
+            f" | {self.ok / max(self.elapsed, 1e-6):.1f} items/s in {self.elapsed:.1f}s"
+            f" | final rate {self.rate:.1f}/s"
+        )
+
+
+class BulkWriter:
+    # Items run in lanes: the floors appended to one thread go one after the other, in
+    # order, and a failed floor skips the rest of its thread; lanes run side by side on
+    # `workers` threads. Every request waits for the rate limiter, which slows down when
+    # the server sheds load (those items are sent again, the server did not take them).
+    # The client does not retry on its own here: MAX_ATTEMPTS is the whole budget of an item.
+    DEFAULT_WORKERS = 4
+    DEFAULT_RATE = 5.0
+    # Refused by the server before doing anything, so sending them again can not duplicate
+    SHED_STATUS = ServerError.SHED_STATUS
+    MAX_ATTEMPTS = 5
+
+    def __init__(
+            self,
+            client: AnoBbsClient,
+            workers: int = DEFAULT_WORKERS,
+            rate: float = DEFAULT_RATE,
+            max_rate: Optional[float] = None,
+    ):
+        self.__client = client
+        self.workers = max(1, workers)
+        self.limiter = AimdRateLimiter(rate, max_rate=max_rate)
+        self.__stats_lock = threading.Lock()
+
+    def __send(self, item: BulkItem):
+        if item.kind == BulkItem.APPEND:
+            res = self.__client.append_page(
+                item.page_id,
+                item.content,
+                idempotency_key=item.idempotency_key,
+                retry=False,
+            )
+            return res.get("no") if isinstance(res, dict) else res
+        return self.__client.post_page(
+            item.content,
+            item.group_name,
+            idempotency_key=item.idempotency_key,
+            retry=False,
+        )
+
+    def __run_item(self, item: BulkItem) -> bool:
+        while True:
+            self.limiter.acquire()
+            item.attempts += 1
+            start = time.monotonic()
+            try:
+                item.result = self.__send(item)
+            except AnoBbsError as error:
+                item.latency = time.monotonic() - start
+                if error.retryable:
+                    self.limiter.failure()
+                # Shed by the server, or never delivered at all
+                if error.retryable and error.unsent and item.attempts < self.MAX_ATTEMPTS:
+                    continue
+                item.error = str(error)
+                item.transient = self.__client.write_resendable(error, item.idempotency_key)
+                item.status = "unknown" if error.transient and not item.transient else "failed"
+                return False
+            item.latency = time.monotonic() - start
+            self.limiter.success()
+            if item.result is None:
+                item.status, item.error = "failed", "empty answer"
+                return False
+            item.status = "ok"
+            return True
+
+    def __run_lane(self, items: List[BulkItem], stats: BulkStats, on_result: Callable[[BulkItem], None]) -> None:
+        failed = None
+        for item in items:
+            if failed is not None:
+                item.status, item.error = "skipped", f"item {failed.index} of this thread failed"
+            else:
+                try:
+                    ok = self.__run_item(item)
+                except Exception as error:
+                    item.status, item.error = "failed", str(error)
+                    ok = False
+                if not ok:
+                    failed = item
+            with self.__stats_lock:
+                if item.status == "ok":
+                    stats.ok += 1
+                elif item.status == "skipped":
+                    stats.skipped += 1
+                elif item.status == "unknown":
+                    stats.unknown += 1
+                else:
+                    stats.failed += 1
+                on_result(item)
+
+    def run(
+            self,
+            items: Iterable[BulkItem],
+            on_result: Optional[Callable[[BulkItem], None]] = None,
+    ) -> BulkStats:
+        lanes = OrderedDict()
+        for item in items:
+            lanes.setdefault(item.lane, []).append(item)
+        stats = BulkStats(sum(map(len, lanes.values())))
+        on_result = on_result or (lambda _: None)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="BulkWriter") as executor:
+            # Lanes are submitted as workers free up, a million posts are not a million futures
+            pending = set()
+            for lane in lanes.values():
+                if len(pending) >= self.workers * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(executor.submit(self.__run_lane, lane, stats, on_result))
+            wait(pending)
+        stats.finished_at = time.monotonic()
+        stats.rate = self.limiter.rate
+        return stats
@@ -0,0 +1,106 @@
+__all__ = [
+    "CompletionCache",
+]
+
+import logging
+import os
+import pathlib
+import threading
+import time
+from typing import Optional, AnyStr, List, Iterable, TYPE_CHECKING
+
+from ..completion_index import CompletionIndex
+
+if TYPE_CHECKING:
+    import sqlite3
+
+logger = logging.getLogger("CompletionCache")
+
+
+class CompletionCache:
+    class Kinds:
+        PAGES = "page_id"
+        NOS = "floor_no"
+        ACS = "anocode"
+
+    DEFAULT_MAX_SIZE = 2000
+    DEFAULT_LOOKUP_LIMIT = 200
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS completions (
+            kind TEXT NOT NULL,
+            value TEXT NOT NULL,
+            used_at REAL NOT NULL,
+            PRIMARY KEY (kind, value)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS completions_used_at ON completions (kind, used_at);
+    """
+
+    def __init__(
+            self,
+            path: pathlib.Path,
+            max_size: int = DEFAULT_MAX_SIZE,
+            index: Optional[CompletionIndex] = None,
+    ):
+        self._path = path
+        self._max_size = max_size
+        self._index = index
+        self.__connection: Optional["sqlite3.Connection"] = None
+        self.__lock = threading.RLock()
+
+    @property
+    def connection(self) -> "sqlite3.Connection":
+        with self.__lock:
+            if self.__connection is None:
+                import sqlite3
+
+                os.makedirs(self._path.parent, exist_ok=True)
+                self.__connection = sqlite3.connect(str(self._path), check_same_thread=False)
+                self.__connection.executescript(self.SCHEMA)
+            return self.__connection
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
+
+    def add(self, kind: AnyStr, values: Iterable) -> None:
+        now = time.time()
+        rows = [(kind, str(value), now) for value in values]
+        if not rows:
+            return
+        with self.__lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO completions (kind, value, used_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            # Keep only the most recently seen `max_size` values of this kind
+            self.connection.execute(
+                "DELETE FROM completions WHERE kind = ? AND value IN ("
+                "SELECT value FROM completions WHERE kind = ? ORDER BY used_at DESC LIMIT -1 OFFSET ?"
+                ")",
+                (kind, kind, self._max_size),
+            )
+            self.connection.commit()
+            if self._index is not None:
+                self.export(kind)
+
+    def export(self, kind: AnyStr) -> None:
+        # Plain sorted file read by the shell completion fast path
+        with self.__lock:
+            rows = self.connection.execute(
+                "SELECT value FROM completions WHERE kind = ?",
+                (kind,),
+            ).fetchall()
+            self._index.write(kind, [row[0] for row in rows])
+
+    def lookup(self, kind: AnyStr, prefix: AnyStr = "", limit: int = DEFAULT_LOOKUP_LIMIT) -> List[AnyStr]:
+        # A range over the primary key, so the cost follows the result and not the history
+        with self.__lock:
+            rows = self.connection.execute(
+                "SELECT value FROM completions WHERE kind = ? AND value >= ? AND value < ? "
+                "ORDER BY value LIMIT ?",
+                (kind, prefix, prefix + "\U0010ffff", limit),
+            ).fetchall()
+        return [row[0] for row in rows]
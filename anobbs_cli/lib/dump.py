@@ -0,0 +1,272 @@
+__all__ = [
+    "BoardDump",
+    "DumpStats",
+]
+
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional, AnyStr, List, Callable, Iterator, Tuple
+
+from .anobbs_client import AnoBbsClient
+from .paging import PageSizeTuner
+
+logger = logging.getLogger("BoardDump")
+
+
+class DumpStats:
+    def __init__(self, threads: int = 0, floors: int = 0, bytes_written: int = 0):
+        self.threads = threads
+        self.floors = floors
+        self.bytes_written = bytes_written
+        self.skipped = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+        # Throughput only counts this run, a resumed dump does not look faster than it is
+        self.__base = (threads, floors, bytes_written)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def rates(self) -> Tuple[float, float, float]:
+        elapsed = max(self.elapsed, 1e-6)
+        return (
+            (self.threads - self.__base[0]) / elapsed,
+            (self.floors - self.__base[1]) / elapsed,
+            (self.bytes_written - self.__base[2]) / elapsed,
+        )
+
+    def __str__(self):
+        threads_rate, floors_rate, bytes_rate = self.rates()
+        return (
+            f"{self.threads} threads, {self.floors} floors, {self.bytes_written / 1024 / 1024:.1f} MiB"
+            f" | {threads_rate:.1f} threads/s, {floors_rate:.0f} floors/s, {bytes_rate / 1024:.0f} KiB/s"
+            f" | skipped {self.skipped}, failed {self.failed}"
+        )
+
+
+class _AppendFile:
+    # Append-only file that can be cut back to the last checkpoint; gzip output is
+    # written as one gzip member per checkpoint, which `gzip -d` and `zcat` read as one stream
+    def __init__(self, path: pathlib.Path, offset: int, compress: bool = False):
+        self.__raw = open(path, "r+b" if path.exists() else "wb")
+        self.__raw.truncate(offset)
+        self.__raw.seek(offset)
+        self.__compress = compress
+        self.__stream = None
+
+    def write(self, data: bytes) -> None:
+        if self.__stream is None:
+            if self.__compress:
+                import gzip
+
+                self.__stream = gzip.GzipFile(fileobj=self.__raw, mode="wb")
+            else:
+                self.__stream = self.__raw
+        self.__stream.write(data)
+
+    def sync(self) -> int:
+        if self.__compress and self.__stream is not None:
+            self.__stream.close()
+            self.__stream = None
+        self.__raw.flush()
+        os.fsync(self.__raw.fileno())
+        return self.__raw.tell()
+
+    def close(self) -> int:
+        offset = self.sync()
+        self.__raw.close()
+        return offset
+
+
+class BoardDump:
+    # Every thread of every group as one NDJSON record: the page summary from the group
+    # listing plus all of its floors. Progress is checkpointed next to the output, an
+    # interrupted dump started again with the same output resumes after the last checkpoint.
+    DEFAULT_WORKERS = 8
+    DEFAULT_CHECKPOINT_RECORDS = 200
+    DEFAULT_CHECKPOINT_INTERVAL = 10.0
+    CHECKPOINT_VERSION = 1
+
+    def __init__(
+            self,
+            client: AnoBbsClient,
+            output: AnyStr,
+            compress: Optional[bool] = None,
+            workers: int = DEFAULT_WORKERS,
+            groups: Optional[List[AnyStr]] = None,
+            checkpoint_records: int = DEFAULT_CHECKPOINT_RECORDS,
+            checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+    ):
+        self.__client = client
+        self.output = pathlib.Path(output)
+        self.compress = self.output.suffix == ".gz" if compress is None else compress
+        self.workers = max(1, workers)
+        self.groups = list(groups) if groups else None
+        self.checkpoint_path = self.output.with_name(self.output.name + ".checkpoint")
+        self.ids_path = self.output.with_name(self.output.name + ".ids")
+        self.__checkpoint_records = max(1, checkpoint_records)
+        self.__checkpoint_interval = checkpoint_interval
+
+    @property
+    def resumable(self) -> bool:
+        return self.checkpoint_path.is_file()
+
+    def __load_checkpoint(self) -> dict:
+        if not self.resumable:
+            return {"output_offset": 0, "ids_offset": 0, "threads": 0, "floors": 0, "bytes": 0}
+        with open(self.checkpoint_path, "r") as file:
+            checkpoint = json.load(file)
+        if checkpoint.get("version") != self.CHECKPOINT_VERSION or checkpoint.get("compress") != self.compress:
+            raise ValueError(f"Checkpoint does not match this dump, remove it to start over: {self.checkpoint_path}")
+        return checkpoint
+
+    def __load_done_ids(self, ids_offset: int) -> set:
+        if not self.ids_path.is_file():
+            return set()
+        with open(self.ids_path, "rb") as file:
+            return set(file.read(ids_offset).decode("utf-8").split())
+
+    def __write_checkpoint(self, checkpoint: dict) -> None:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=str(self.checkpoint_path.parent),
+            prefix=f".{self.checkpoint_path.name}.",
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(json.dumps(checkpoint, indent=2))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.checkpoint_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def __iter_threads(self, done_ids: set, stats: DumpStats) -> Iterator[Tuple[AnyStr, dict]]:
+        groups = self.groups
+        if groups is None:
+            groups = self.__client.list_group()
+            if groups is None:
+                raise RuntimeError("Can not list groups")
+        seen = set(done_ids)
+        for group_name in groups:
+            # max_age=0: a dump and its checkpoint are built from the server's data, never from the cache
+            for page in self.__client.iter_group_pages(group_name, max_age=0):
+                # A thread shows up in "all" and in its own group, it is dumped once
+                if page["id"] in seen:
+                    stats.skipped += 1
+                    continue
+                seen.add(page["id"])
+                yield group_name, page
+
+    def __fetch_thread(self, group_name: AnyStr, page: dict) -> Optional[dict]:
+        floors = list(self.__client.iter_floors(
+            page["id"],
+            PageSizeTuner(initial_size=AnoBbsClient.DEFAULT_FLOOR_PAGE_SIZE),
+            max_age=0,
+        ))
+        # A failed request raises, a short answer is caught here: the thread is retried on the next run
+        if len(floors) < page.get("floor_count", 0):
+            return None
+        return {"group": group_name, **page, "floors": floors}
+
+    def run(self, on_progress: Optional[Callable[[DumpStats], None]] = None) -> DumpStats:
+        checkpoint = self.__load_checkpoint()
+        done_ids = self.__load_done_ids(checkpoint["ids_offset"])
+        stats = DumpStats(checkpoint["threads"], checkpoint["floors"], checkpoint["bytes"])
+        if done_ids:
+            logger.info(f"Resuming after {len(done_ids)} threads: {self.checkpoint_path}")
+
+        os.makedirs(self.output.parent, exist_ok=True)
+        output = _AppendFile(self.output, checkpoint["output_offset"], compress=self.compress)
+        ids = _AppendFile(self.ids_path, checkpoint["ids_offset"])
+        since_checkpoint = 0
+        last_checkpoint = time.monotonic()
+
+        def save_checkpoint(complete: bool = False) -> None:
+            nonlocal since_checkpoint, last_checkpoint
+            # Data first, then the checkpoint pointing at it
+            self.__write_checkpoint({
+                "version": self.CHECKPOINT_VERSION,
+                "compress": self.compress,
+                "output_offset": output.sync(),
+                "ids_offset": ids.sync(),
+                "threads": stats.threads,
+                "floors": stats.floors,
+                "bytes": stats.bytes_written,
+                "complete": complete,
+                "saved_at": time.time(),
+            })
+            since_checkpoint = 0
+            last_checkpoint = time.monotonic()
+            if on_progress is not None:
+                on_progress(stats)
+
+        def write_record(page_id: AnyStr, record: dict) -> None:
+            nonlocal since_checkpoint
+            line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            output.write(line)
+            ids.write(f"{page_id}\n".encode("utf-8"))
+            stats.threads += 1
+            stats.floors += len(record["floors"])
+            stats.bytes_written += len(line)
+            since_checkpoint += 1
+            if (
+                    since_checkpoint >= self.__checkpoint_records
+                    or time.monotonic() - last_checkpoint >= self.__checkpoint_interval
+            ):
+                save_checkpoint()
+
+        def collect(futures: dict, return_when) -> None:
+            finished, _ = wait(futures, return_when=return_when)
+            for future in finished:
+                page_id = futures.pop(future)
+                try:
+                    record = future.result()
+                except Exception as error:
+                    logger.error(f"Thread {page_id}: {error}")
+                    record = None
+                if record is None:
+                    stats.failed += 1
+                else:
+                    write_record(page_id, record)
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="BoardDump")
+        futures = {}
+        try:
+            for group_name, page in self.__iter_threads(done_ids, stats):
+                # Bounded in flight, a board with a million threads is not queued up at once
+                while len(futures) >= self.workers * 2:
+                    collect(futures, FIRST_COMPLETED)
+                futures[executor.submit(self.__fetch_thread, group_name, page)] = page["id"]
+            while futures:
+                collect(futures, FIRST_COMPLETED)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            # Finished fetches still make it into the checkpoint
+            for future, page_id in futures.items():
+                if future.done() and not future.cancelled() and future.exception() is None and future.result():
+                    write_record(page_id, future.result())
+            save_checkpoint()
+            output.close()
+            ids.close()
+            raise
+        executor.shutdown(wait=True)
+        save_checkpoint(complete=stats.failed == 0)
+        output.close()
+        ids.close()
+        return stats
+
+    def finish(self) -> None:
+        # A complete dump needs no resume state
+        for path in (self.checkpoint_path, self.ids_path):
+            if path.exists():
+                os.unlink(path)
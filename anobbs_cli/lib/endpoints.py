@@ -0,0 +1,153 @@
+__all__ = [
+    "Endpoint",
+    "EndpointPool",
+]
+
+import logging
+import math
+import threading
+import time
+from typing import Optional, AnyStr, List, Callable, Sequence
+
+logger = logging.getLogger("EndpointPool")
+
+
+class Endpoint:
+    def __init__(self, address: AnyStr):
+        self.address = address
+        self.latency: Optional[float] = None
+        self.healthy = True
+        self.failures = 0
+        self.last_error: Optional[AnyStr] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "address": self.address,
+            "healthy": self.healthy,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class EndpointPool:
+    # The first address is the primary: every write goes there. Reads go to the healthy
+    # endpoint with the lowest smoothed hello_world latency, the others are tried in turn
+    # when it fails. A failed endpoint is skipped until a probe finds it back up.
+    DEFAULT_PROBE_INTERVAL = 30.0
+    SMOOTHING = 0.3
+
+    def __init__(
+            self,
+            addresses: Sequence[AnyStr],
+            probe: Optional[Callable[[AnyStr], bool]] = None,
+            probe_interval: float = DEFAULT_PROBE_INTERVAL,
+    ):
+        if not addresses:
+            raise ValueError("At least one endpoint is needed")
+        self.__endpoints = [Endpoint(address) for address in addresses]
+        self.__probe = probe
+        self.__probe_interval = max(1.0, probe_interval)
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def addresses(self) -> List[AnyStr]:
+        return [endpoint.address for endpoint in self.__endpoints]
+
+    @property
+    def primary(self) -> AnyStr:
+        return self.__endpoints[0].address
+
+    def __get(self, address: AnyStr) -> Optional[Endpoint]:
+        for endpoint in self.__endpoints:
+            if endpoint.address == address:
+                return endpoint
+        return None
+
+    def read_order(self) -> List[AnyStr]:
+        # Unmeasured endpoints rank after measured ones, the primary first among them
+        self.start_probing()
+        with self.__lock:
+            ranked = sorted(
+                enumerate(self.__endpoints),
+                key=lambda item: (
+                    not item[1].healthy,
+                    math.inf if item[1].latency is None else item[1].latency,
+                    item[0],
+                ),
+            )
+            return [endpoint.address for _, endpoint in ranked]
+
+    def write_order(self) -> List[AnyStr]:
+        # Never failed over: a replica may not take writes and a timed out write may have landed
+        return [self.primary]
+
+    def observe(self, address: AnyStr, latency: Optional[float] = None) -> None:
+        with self.__lock:
+            endpoint = self.__get(address)
+            if endpoint is None:
+                return
+            if not endpoint.healthy and len(self.__endpoints) > 1:
+                logger.info(f"Endpoint back up: {address}")
+            endpoint.healthy = True
+            endpoint.failures = 0
+            endpoint.last_error = None
+            if latency is not None:
+                if endpoint.latency is None:
+                    endpoint.latency = latency
+                else:
+                    endpoint.latency += self.SMOOTHING * (latency - endpoint.latency)
+
+    def fail(self, address: AnyStr, error) -> None:
+        with self.__lock:
+            endpoint = self.__get(address)
+            if endpoint is None:
+                return
+            # With a single endpoint there is nothing to route around, the caller reports the error
+            if endpoint.healthy and len(self.__endpoints) > 1:
+                logger.warning(f"Endpoint down: {address}: {error}")
+            endpoint.healthy = False
+            endpoint.failures += 1
+            endpoint.last_error = str(error)
+
+    def probe(self, address: AnyStr) -> bool:
+        start = time.monotonic()
+        try:
+            ok = self.__probe(address)
+        except Exception as error:
+            self.fail(address, error)
+            return False
+        if ok:
+            self.observe(address, time.monotonic() - start)
+        else:
+            self.fail(address, "hello_world failed")
+        return ok
+
+    def probe_all(self) -> None:
+        for address in self.addresses:
+            if self.__stop.is_set():
+                return
+            self.probe(address)
+
+    def __probe_loop(self) -> None:
+        while not self.__stop.is_set():
+            self.probe_all()
+            self.__stop.wait(self.__probe_interval)
+
+    def start_probing(self) -> None:
+        # A single endpoint has nothing to choose from, it is not probed
+        if self.__probe is None or len(self.__endpoints) < 2 or self.__thread is not None:
+            return
+        with self.__lock:
+            if self.__thread is None and not self.__stop.is_set():
+                self.__thread = threading.Thread(target=self.__probe_loop, name="EndpointProbe", daemon=True)
+                self.__thread.start()
+
+    def status(self) -> List[dict]:
+        with self.__lock:
+            return [endpoint.as_dict() for endpoint in self.__endpoints]
+
+    def close(self) -> None:
+        self.__stop.set()
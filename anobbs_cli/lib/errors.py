@@ -0,0 +1,88 @@
+__all__ = [
+    "AnoBbsError",
+    "ApiError",
+    "CircuitOpenError",
+    "NotCachedError",
+    "NotLoggedInError",
+    "ServerError",
+    "TransportError",
+]
+
+from typing import Optional, AnyStr
+
+
+class AnoBbsError(Exception):
+    # Every failure of a client call, an empty answer is returned, never raised.
+    # `retryable`: worth sending again right away; `transient`: worth keeping to send later.
+    # `unsent`: the request can not have reached the server, resending it can not duplicate a write
+    retryable = False
+    transient = False
+    unsent = False
+
+
+class NotLoggedInError(AnoBbsError):
+    transient = True
+    unsent = True
+
+
+class NotCachedError(AnoBbsError):
+    pass
+
+
+class ApiError(AnoBbsError):
+    # The server answered and refused, asking again gets the same answer
+    def __init__(self, api: AnyStr, code, message: AnyStr):
+        super().__init__(f"{api}: {message} (code {code})")
+        self.api = api
+        self.code = code
+        self.message = message
+
+
+class ServerError(AnoBbsError):
+    RETRYABLE_STATUS = (429, 502, 503, 504)
+    # Turned away before the server did anything
+    SHED_STATUS = (429, 503)
+
+    def __init__(self, api: AnyStr, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"{api}: HTTP {status_code}")
+        self.api = api
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code in self.RETRYABLE_STATUS
+
+    @property
+    def transient(self) -> bool:
+        return self.status_code >= 500 or self.status_code == 429
+
+    @property
+    def unsent(self) -> bool:
+        return self.status_code in self.SHED_STATUS
+
+
+class TransportError(AnoBbsError):
+    # Connection refused, reset or timed out. `sent`: the request may have reached the server,
+    # only a connection that was never made tells for sure that it did not
+    retryable = True
+    transient = True
+
+    def __init__(self, api: AnyStr, cause, sent: bool = True):
+        super().__init__(f"{api}: {cause}")
+        self.api = api
+        self.cause = cause
+        self.sent = sent
+
+    @property
+    def unsent(self) -> bool:
+        return not self.sent
+
+
+class CircuitOpenError(TransportError):
+    # Not sent at all, the server failed too often lately
+    retryable = False
+
+    def __init__(self, api: AnyStr, retry_after: float):
+        super().__init__(api, f"server unavailable, not retried for {retry_after:.0f}s", sent=False)
+        self.retry_after = retry_after
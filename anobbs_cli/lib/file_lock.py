@@ -0,0 +1,44 @@
+__all__ = [
+    "FileLock",
+]
+
+import os
+import pathlib
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class FileLock:
+    # Advisory lock shared between processes (flock) and between threads of this process
+    def __init__(self, path: pathlib.Path):
+        self._path = path
+        self.__thread_lock = threading.RLock()
+        self.__fd = None
+        self.__depth = 0
+
+    def acquire(self) -> None:
+        self.__thread_lock.acquire()
+        if self.__depth == 0 and fcntl is not None:
+            os.makedirs(self._path.parent, exist_ok=True)
+            self.__fd = os.open(str(self._path), os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self.__fd, fcntl.LOCK_EX)
+        self.__depth += 1
+
+    def release(self) -> None:
+        self.__depth -= 1
+        if self.__depth == 0 and self.__fd is not None:
+            fcntl.flock(self.__fd, fcntl.LOCK_UN)
+            os.close(self.__fd)
+            self.__fd = None
+        self.__thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *_):
+        self.release()
@@ -0,0 +1,126 @@
+__all__ = [
+    "HttpTransport",
+]
+
+import importlib.util
+import logging
+import threading
+from typing import AnyStr, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger("HttpTransport")
+
+
+class HttpTransport:
+    DEFAULT_POOL_SIZE = 10
+    DEFAULT_CONNECT_TIMEOUT = 3.05
+    DEFAULT_READ_TIMEOUT = 30.0
+
+    @staticmethod
+    def accept_encoding() -> AnyStr:
+        encodings = ["gzip", "deflate"]
+        # urllib3 only decodes brotli when one of these is installed, looked up without importing it
+        if any(importlib.util.find_spec(name) is not None for name in ("brotli", "brotlicffi")):
+            encodings.append("br")
+        return ", ".join(encodings)
+
+    def __init__(
+            self,
+            pool_size: int = DEFAULT_POOL_SIZE,
+            connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+            read_timeout: float = DEFAULT_READ_TIMEOUT,
+            use_compression: bool = True,
+    ):
+        self._pool_size = max(1, int(pool_size))
+        self._timeout = (float(connect_timeout), float(read_timeout))
+        self._use_compression = use_compression
+        self.__session: Optional["requests.Session"] = None
+        self.__session_lock = threading.Lock()
+        self.__local = threading.local()
+
+    @property
+    def pool_size(self) -> int:
+        return self._pool_size
+
+    @property
+    def timeout(self) -> tuple:
+        return self._timeout
+
+    @property
+    def last_response_bytes(self) -> int:
+        return getattr(self.__local, "last_response_bytes", 0)
+
+    @property
+    def session(self) -> "requests.Session":
+        if self.__session is None:
+            with self.__session_lock:
+                if self.__session is None:
+                    self.__session = self.__create_session()
+        return self.__session
+
+    def __create_session(self) -> "requests.Session":
+        # requests is the heaviest import of the cli, only pay for it on the first request
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self._pool_size,
+            pool_maxsize=self._pool_size,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "Connection": "keep-alive",
+            "Accept": "application/json",
+            "Accept-Encoding": self.accept_encoding() if self._use_compression else "identity",
+        })
+        logger.debug(f"New session, pool size: {self._pool_size}, timeout: {self._timeout}")
+        return session
+
+    def request(
+            self,
+            method: AnyStr,
+            url: AnyStr,
+            data: Optional[dict] = None,
+            timeout: Optional[tuple] = None,
+            headers: Optional[dict] = None,
+    ) -> "requests.Response":
+        method = method.upper()
+        res = self.session.request(
+            method,
+            url,
+            json=data if method == "POST" else None,
+            timeout=timeout if timeout is not None else self._timeout,
+            headers=headers,
+        )
+        self.__local.last_response_bytes = len(res.content)
+        return res
+
+    @staticmethod
+    def never_sent(error: BaseException) -> bool:
+        # The connection was never made (refused, unresolved, timed out connecting), so the server
+        # can not have seen the request; a reset or a read timeout may come after it was handled
+        from requests.exceptions import ConnectTimeout, ConnectionError
+        from urllib3.exceptions import ConnectTimeoutError
+
+        if isinstance(error, ConnectTimeout):
+            return True
+        if isinstance(error, ConnectionError) and error.args:
+            # A MaxRetryError, NewConnectionError and NameResolutionError are ConnectTimeoutErrors too
+            return isinstance(getattr(error.args[0], "reason", None), ConnectTimeoutError)
+        return False
+
+    def close(self) -> None:
+        with self.__session_lock:
+            if self.__session is not None:
+                self.__session.close()
+                self.__session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,264 @@
+__all__ = [
+    "ReplayStats",
+    "WriteJournal",
+    "replay_journal",
+]
+
+import json
+import logging
+import os
+import pathlib
+import time
+import uuid
+from typing import Optional, AnyStr, List, Callable, Iterable, Set, TYPE_CHECKING
+
+from .file_lock import FileLock
+
+if TYPE_CHECKING:
+    from .anobbs_client import AnoBbsClient
+    from .bulk import BulkItem
+
+logger = logging.getLogger("WriteJournal")
+
+
+class WriteJournal:
+    # Append-only NDJSON log of the posts and appends not known to have reached the server.
+    # A write is logged and fsync'd before it is sent, with a key the server can use to drop
+    # a second copy; "done" and "failed" lines settle it, compact() rewrites the log without
+    # the settled ones. Writes the server refused are moved aside to `<journal>.failed`, and so
+    # are the ones of unknown outcome, that may have landed and are never sent again.
+    ADD = "add"
+    DONE = "done"
+    FAILED = "failed"
+    UNKNOWN = "unknown"
+
+    def __init__(self, path: pathlib.Path):
+        self._path = pathlib.Path(path)
+        self.__lock = FileLock(self._path.parent / f"{self._path.name}.lock")
+        # Held for a whole replay, two processes never send the same pending write at once
+        self.replay_lock = FileLock(self._path.parent / f"{self._path.name}.replay.lock")
+        self.replayed_at: Optional[float] = None
+        # Key -> time.monotonic() of the last add/done/failed written by this process
+        self.__touched = {}
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self._path
+
+    @property
+    def failed_path(self) -> pathlib.Path:
+        return self._path.parent / f"{self._path.name}.failed"
+
+    @staticmethod
+    def __append_lines(path: pathlib.Path, records: Iterable[dict]) -> None:
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        if not data:
+            return
+        os.makedirs(path.parent, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def __append(self, records: List[dict]) -> None:
+        with self.__lock:
+            self.__append_lines(self._path, records)
+            now = time.monotonic()
+            self.__touched.update((record["key"], now) for record in records)
+
+    def touched_since(self, since: float) -> Set[AnyStr]:
+        # Keys this process journaled or settled from `since` (time.monotonic()) on
+        with self.__lock:
+            return {key for key, at in self.__touched.items() if at >= since}
+
+    def add_many(self, writes: Iterable[dict]) -> List[dict]:
+        # One fsync for the whole batch
+        records = [
+            {
+                "op": self.ADD,
+                "key": write.get("idempotency_key") or uuid.uuid4().hex,
+                "kind": write["kind"],
+                "content": write["content"],
+                "page_id": write.get("page_id"),
+                "group_name": write.get("group_name", "all"),
+                "created_at": time.time(),
+            }
+            for write
+            in writes
+        ]
+        self.__append(records)
+        return records
+
+    def add(
+            self,
+            kind: AnyStr,
+            content: AnyStr,
+            page_id: Optional[AnyStr] = None,
+            group_name: AnyStr = "all",
+    ) -> dict:
+        return self.add_many([{"kind": kind, "content": content, "page_id": page_id, "group_name": group_name}])[0]
+
+    def done(self, key: AnyStr, result=None) -> None:
+        self.__append([{"op": self.DONE, "key": key, "result": result}])
+
+    def failed(self, key: AnyStr, error: AnyStr) -> None:
+        self.__append([{"op": self.FAILED, "key": key, "error": error}])
+
+    def unknown(self, key: AnyStr, error: AnyStr) -> None:
+        self.__append([{"op": self.UNKNOWN, "key": key, "error": error}])
+
+    def settle(self, item: "BulkItem") -> None:
+        # A write that did not reach the server stays pending, one that was refused or may
+        # have landed is settled
+        if item.status == "ok":
+            self.done(item.idempotency_key, item.result)
+        elif item.status == "unknown":
+            logger.error(f"Outcome unknown, not sent again, moved to {self.failed_path} on compaction: {item.error}")
+            self.unknown(item.idempotency_key, item.error)
+        elif item.status == "failed" and not item.transient:
+            logger.error(f"Refused, moved to {self.failed_path} on compaction: {item.error}")
+            self.failed(item.idempotency_key, item.error)
+
+    def __read(self) -> List[dict]:
+        try:
+            with open(self._path, "r", encoding="utf-8") as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # The tail of a write cut short by a crash, it was never acknowledged
+                logger.warning(f"Skipped a damaged line in {self._path}")
+        return records
+
+    def __settle(self) -> tuple:
+        adds, failed = {}, {}
+        for record in self.__read():
+            op = record.get("op")
+            if op == self.ADD:
+                adds[record["key"]] = record
+            elif op == self.DONE:
+                adds.pop(record.get("key"), None)
+            elif op in (self.FAILED, self.UNKNOWN) and record.get("key") in adds:
+                failed[record["key"]] = {
+                    **adds.pop(record["key"]),
+                    "error": record.get("error"),
+                    "outcome": op,
+                }
+        return list(adds.values()), list(failed.values())
+
+    def pending(self) -> List[dict]:
+        with self.__lock:
+            return self.__settle()[0]
+
+    def has_pending(self) -> bool:
+        # A stat, cheap enough for every command; compact() leaves an empty file behind
+        try:
+            return self._path.stat().st_size > 0
+        except FileNotFoundError:
+            return False
+
+    def compact(self) -> int:
+        with self.__lock:
+            pending, failed = self.__settle()
+            self.__append_lines(self.failed_path, failed)
+            tmp_path = self._path.parent / f".{self._path.name}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in pending))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self._path)
+            pending_keys = {record["key"] for record in pending}
+            self.__touched = {key: at for key, at in self.__touched.items() if key in pending_keys}
+        return len(pending)
+
+
+class ReplayStats:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.unknown = 0
+        self.pending = 0
+
+    def __str__(self):
+        return (
+            f"sent {self.sent}, refused {self.failed}, outcome unknown {self.unknown},"
+            f" still pending {self.pending}"
+        )
+
+
+def replay_journal(
+        client: "AnoBbsClient",
+        journal: WriteJournal,
+        workers: int = 4,
+        batch_size: int = 100,
+        on_result: Optional[Callable[["BulkItem"], None]] = None,
+        before: Optional[float] = None,
+        exclude: Iterable[AnyStr] = (),
+) -> ReplayStats:
+    # `before` (time.time()) and `exclude` (keys) leave out the writes a command has just tried itself,
+    # along with the later floors of their threads
+    from .bulk import BulkItem, BulkWriter
+
+    stats = ReplayStats()
+    exclude = set(exclude)
+    with journal.replay_lock:
+        # Threads with a floor still queued, their later floors wait too so the order holds
+        blocked = set()
+        pending = []
+        for record in journal.pending():
+            if (
+                    (before is not None and record.get("created_at", 0.0) >= before)
+                    or record["key"] in exclude
+            ):
+                if record["kind"] == BulkItem.APPEND:
+                    blocked.add(record.get("page_id"))
+                continue
+            pending.append(record)
+        writer = BulkWriter(client, workers=workers)
+        for offset in range(0, len(pending), batch_size):
+            items = [
+                BulkItem(
+                    offset + index,
+                    record["kind"],
+                    record["content"],
+                    page_id=record.get("page_id"),
+                    group_name=record.get("group_name", "all"),
+                    idempotency_key=record["key"],
+                )
+                for index, record
+                in enumerate(pending[offset:offset + batch_size])
+                if record.get("page_id") not in blocked or record["kind"] != BulkItem.APPEND
+            ]
+            if not items:
+                continue
+
+            def settle(item: BulkItem) -> None:
+                journal.settle(item)
+                if item.status == "ok":
+                    stats.sent += 1
+                elif item.status == "unknown":
+                    stats.unknown += 1
+                elif item.status == "failed" and not item.transient:
+                    stats.failed += 1
+                if on_result is not None:
+                    on_result(item)
+
+            batch = writer.run(items, on_result=settle)
+            # A floor that may or may not have landed holds the rest of its thread until the next replay
+            blocked.update(
+                item.page_id
+                for item
+                in items
+                if item.kind == BulkItem.APPEND and (item.queued or item.status == "unknown")
+            )
+            if batch.ok == 0 and all(item.queued or item.status == "unknown" for item in items):
+                # Nothing got through, the server is still away: the rest waits for the next replay
+                logger.warning(f"Server unreachable, {len(pending) - offset} writes stay queued")
+                break
+        stats.pending = journal.compact()
+        journal.replayed_at = time.monotonic()
+    return stats
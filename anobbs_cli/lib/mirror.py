@@ -0,0 +1,298 @@
+__all__ = [
+    "Mirror",
+    "MirrorSync",
+    "SyncStats",
+]
+
+import json
+import logging
+import math
+import os
+import pathlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, AnyStr, List, Iterable, Tuple, TYPE_CHECKING
+
+from .anobbs_client import AnoBbsClient
+
+if TYPE_CHECKING:
+    import sqlite3
+
+logger = logging.getLogger("Mirror")
+
+
+class Mirror:
+    # Local copy of groups, pages and floors of one server
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS groups (
+            name TEXT PRIMARY KEY,
+            synced_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS pages (
+            id TEXT PRIMARY KEY,
+            owner_ac TEXT,
+            update_date REAL,
+            floor_count INTEGER NOT NULL,
+            synced_floor_count INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL,
+            synced_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS group_pages (
+            group_name TEXT NOT NULL,
+            page_id TEXT NOT NULL,
+            PRIMARY KEY (group_name, page_id)
+        );
+        CREATE TABLE IF NOT EXISTS floors (
+            no TEXT PRIMARY KEY,
+            page_id TEXT NOT NULL,
+            owner_ac TEXT,
+            create_date REAL,
+            content TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS floors_page_id ON floors (page_id);
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self._path = pathlib.Path(path)
+        self.__connection: Optional["sqlite3.Connection"] = None
+        self.__lock = threading.RLock()
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self._path
+
+    @property
+    def connection(self) -> "sqlite3.Connection":
+        with self.__lock:
+            if self.__connection is None:
+                import sqlite3
+
+                os.makedirs(self._path.parent, exist_ok=True)
+                self.__connection = sqlite3.connect(str(self._path), check_same_thread=False)
+                self.__connection.execute("PRAGMA journal_mode = WAL")
+                self.__connection.executescript(self.SCHEMA)
+            return self.__connection
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
+
+    def bind_address(self, address: AnyStr) -> None:
+        # Floor numbers are only unique per server, one file never mixes two of them
+        with self.__lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'address'").fetchone()
+            if row is None:
+                self.connection.execute("INSERT INTO meta (key, value) VALUES ('address', ?)", (address,))
+                self.connection.commit()
+            elif row[0] != address:
+                raise ValueError(f"{self._path} mirrors {row[0]}, not {address}")
+
+    def page_states(self, page_ids: Iterable[AnyStr]) -> dict:
+        page_ids = list(page_ids)
+        states = {}
+        with self.__lock:
+            for offset in range(0, len(page_ids), 500):
+                batch = page_ids[offset:offset + 500]
+                rows = self.connection.execute(
+                    f"SELECT id, update_date, floor_count, synced_floor_count FROM pages "
+                    f"WHERE id IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                states.update({row[0]: row[1:] for row in rows})
+        return states
+
+    def put_group(self, group_name: AnyStr, pages: List[dict]) -> None:
+        now = time.time()
+        with self.__lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO groups (name, synced_at) VALUES (?, ?)",
+                (group_name, now),
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO group_pages (group_name, page_id) VALUES (?, ?)",
+                [(group_name, page["id"]) for page in pages],
+            )
+            self.connection.commit()
+
+    def put_page(self, page: dict, floors: List[dict]) -> int:
+        # The summary is stored with the floors, a page is only marked synced once they are in
+        with self.__lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO floors (no, page_id, owner_ac, create_date, content, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        str(floor["no"]),
+                        page["id"],
+                        floor.get("owner_ac"),
+                        floor.get("create_date"),
+                        floor.get("content"),
+                        json.dumps(floor, ensure_ascii=False, separators=(",", ":")),
+                    )
+                    for floor
+                    in floors
+                ],
+            )
+            synced_floor_count = self.connection.execute(
+                "SELECT COUNT(*) FROM floors WHERE page_id = ?",
+                (page["id"],),
+            ).fetchone()[0]
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(id, owner_ac, update_date, floor_count, synced_floor_count, data, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    page["id"],
+                    page.get("owner_ac"),
+                    page.get("update_date"),
+                    page.get("floor_count", 0),
+                    synced_floor_count,
+                    json.dumps(page, ensure_ascii=False, separators=(",", ":")),
+                    time.time(),
+                ),
+            )
+            self.connection.commit()
+        return synced_floor_count
+
+    def counts(self) -> Tuple[int, int, int]:
+        with self.__lock:
+            return tuple(
+                self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table
+                in ("groups", "pages", "floors")
+            )
+
+
+class SyncStats:
+    def __init__(self):
+        self.groups = 0
+        self.pages_seen = 0
+        self.pages_changed = 0
+        self.floors_added = 0
+        self.requests = 0
+        self.failed = 0
+
+    def __str__(self):
+        return (
+            f"{self.groups} groups, {self.pages_changed}/{self.pages_seen} pages changed, "
+            f"{self.floors_added} new floors, {self.requests} requests, {self.failed} failed"
+        )
+
+
+class MirrorSync:
+    # Group listings come newest first, so a sync stops reading a group after
+    # `stop_after` unchanged pages in a row, and a changed page only fetches the
+    # floor pages past the floors already mirrored
+    DEFAULT_FLOOR_PAGE_SIZE = 100
+    DEFAULT_WORKERS = 4
+
+    def __init__(
+            self,
+            client: AnoBbsClient,
+            mirror: Mirror,
+            floor_page_size: int = DEFAULT_FLOOR_PAGE_SIZE,
+            workers: int = DEFAULT_WORKERS,
+            stop_after: Optional[int] = AnoBbsClient.DEFAULT_GROUP_PAGE_SIZE,
+    ):
+        self.__client = client
+        self.__mirror = mirror
+        self.floor_page_size = floor_page_size
+        self.workers = max(1, workers)
+        self.stop_after = stop_after
+        self.__stats_lock = threading.Lock()
+
+    def __changed_pages(self, group_name: AnyStr, stats: SyncStats) -> List[Tuple[dict, int]]:
+        changed = []
+        unchanged_in_a_row = 0
+        page_index = 1
+        while True:
+            # max_age=0: the change check compares against the server, a cached listing would hide new floors
+            res = self.__client.query_group_with_pages(
+                group_name,
+                AnoBbsClient.DEFAULT_GROUP_PAGE_SIZE,
+                page_index,
+                max_age=0,
+            )
+            stats.requests += 1
+            if not res:
+                raise RuntimeError(f"Can not list group {group_name}")
+            pages = res["pages"]
+            self.__mirror.put_group(group_name, pages)
+            states = self.__mirror.page_states(page["id"] for page in pages)
+            for page in pages:
+                stats.pages_seen += 1
+                state = states.get(page["id"])
+                if (
+                        state is not None
+                        and state[0] == page.get("update_date")
+                        and state[1] == page.get("floor_count")
+                        and state[2] >= page.get("floor_count", 0)
+                ):
+                    unchanged_in_a_row += 1
+                    if self.stop_after is not None and unchanged_in_a_row >= self.stop_after:
+                        return changed
+                    continue
+                unchanged_in_a_row = 0
+                changed.append((page, state[2] if state is not None else 0))
+            if not pages or page_index * AnoBbsClient.DEFAULT_GROUP_PAGE_SIZE >= res.get("pages_count", 0):
+                return changed
+            page_index += 1
+
+    def __sync_page(self, page: dict, synced_floor_count: int, stats: SyncStats) -> int:
+        # Floors are ordered by `no`, the mirrored ones are a prefix of the thread
+        floor_count = page.get("floor_count", 0)
+        first_index = synced_floor_count // self.floor_page_size + 1
+        last_index = max(first_index, math.ceil(floor_count / self.floor_page_size))
+        floors = []
+        for page_index in range(first_index, last_index + 1):
+            res = self.__client.query_page_with_floor(page["id"], self.floor_page_size, page_index, max_age=0)
+            with self.__stats_lock:
+                stats.requests += 1
+            if not res:
+                break
+            floors.extend(res["floors"])
+            if len(res["floors"]) < self.floor_page_size:
+                break
+        return self.__mirror.put_page(page, floors) - synced_floor_count
+
+    def run(self, groups: Optional[List[AnyStr]] = None) -> SyncStats:
+        if self.__client.offline:
+            raise RuntimeError("Sync needs the server, it can not run offline")
+        self.__mirror.bind_address(self.__client.address)
+        stats = SyncStats()
+        if not groups:
+            groups = self.__client.list_group()
+            stats.requests += 1
+            if groups is None:
+                raise RuntimeError("Can not list groups")
+
+        changed = {}
+        for group_name in groups:
+            stats.groups += 1
+            for page, synced_floor_count in self.__changed_pages(group_name, stats):
+                # The same thread is listed in "all" and in its own group
+                changed.setdefault(page["id"], (page, synced_floor_count))
+        stats.pages_changed = len(changed)
+        logger.debug(f"{len(changed)} pages changed")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="MirrorSync") as executor:
+            futures = [
+                executor.submit(self.__sync_page, page, synced_floor_count, stats)
+                for page, synced_floor_count
+                in changed.values()
+            ]
+            for future in futures:
+                try:
+                    stats.floors_added += max(0, future.result())
+                except Exception as error:
+                    logger.error(error)
+                    stats.failed += 1
+        return stats
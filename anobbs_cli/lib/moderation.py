@@ -0,0 +1,116 @@
+__all__ = [
+    "BlockBatch",
+    "BlockOutcome",
+]
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, AnyStr, List, Callable, Iterable
+
+from .anobbs_client import AnoBbsClient
+
+logger = logging.getLogger("BlockBatch")
+
+
+class BlockOutcome:
+    BLOCKED = "blocked"
+    DUPLICATE = "duplicate"
+    FAILED = "failed"
+
+    def __init__(self, floor_no: AnyStr, owner_ac: Optional[AnyStr] = None):
+        self.floor_no = floor_no
+        self.owner_ac = owner_ac
+        self.status: Optional[AnyStr] = None
+        self.ano_code: Optional[AnyStr] = None
+        # The floor whose block already covers this one, for duplicates
+        self.covered_by: Optional[AnyStr] = None
+        self.error: Optional[AnyStr] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "floor_no": self.floor_no,
+            "status": self.status,
+            "ano_code": self.ano_code or self.owner_ac,
+            "covered_by": self.covered_by,
+            "error": self.error,
+        }
+
+
+class BlockBatch:
+    # One block per anocode: floors whose owner is known (from the selector's page or the local
+    # search index) are grouped by it and sent one at a time until a block lands on that owner,
+    # the others are reported as covered by it. An owner from the index can be stale, so a block
+    # answered with another anocode covers nothing. Owners, and floors of unknown owners, go
+    # `workers` at a time.
+    DEFAULT_WORKERS = 4
+
+    def __init__(self, client: AnoBbsClient, workers: int = DEFAULT_WORKERS):
+        self.__client = client
+        self.workers = max(1, workers)
+
+    def select(self, page_id: AnyStr, owner_ac: AnyStr) -> List[dict]:
+        # Every floor of `owner_ac` in the thread, the whole thread is read
+        return [
+            {"no": str(floor["no"]), "owner_ac": floor.get("owner_ac")}
+            for floor
+            in self.__client.iter_floors(page_id)
+            if floor.get("owner_ac") == owner_ac
+        ]
+
+    def outcomes(self, floors: Iterable) -> List[BlockOutcome]:
+        # Floor numbers or floor dicts, repeated floors are kept once in their first position
+        outcomes = {}
+        for floor in floors:
+            if isinstance(floor, dict):
+                no, owner_ac = str(floor["no"]).strip(), floor.get("owner_ac")
+            else:
+                no, owner_ac = str(floor).strip(), None
+            if no and no not in outcomes:
+                outcomes[no] = BlockOutcome(no, owner_ac)
+        unknown = [outcome.floor_no for outcome in outcomes.values() if outcome.owner_ac is None]
+        for no, owner_ac in self.__client.search_index.owners(unknown).items():
+            outcomes[no].owner_ac = owner_ac
+        return list(outcomes.values())
+
+    def __block(self, outcome: BlockOutcome) -> BlockOutcome:
+        try:
+            res = self.__client.block_ac_by_floor_no(outcome.floor_no)
+        except Exception as error:
+            outcome.status, outcome.error = BlockOutcome.FAILED, str(error)
+            return outcome
+        if res:
+            outcome.status, outcome.ano_code = BlockOutcome.BLOCKED, res
+        else:
+            outcome.status, outcome.error = BlockOutcome.FAILED, "empty answer"
+        return outcome
+
+    def __block_owner(self, floors: List[BlockOutcome]) -> List[BlockOutcome]:
+        # A floor may have been deleted meanwhile, or belong to someone else than the index says:
+        # the owner's next floor gets a turn, until one block is answered with the owner's anocode
+        covering = None
+        for outcome in floors:
+            if covering is not None:
+                outcome.status, outcome.ano_code = BlockOutcome.DUPLICATE, covering.ano_code
+                outcome.covered_by = covering.floor_no
+                continue
+            self.__block(outcome)
+            if outcome.status == BlockOutcome.BLOCKED and outcome.ano_code == outcome.owner_ac:
+                covering = outcome
+        return floors
+
+    def run(
+            self,
+            outcomes: List[BlockOutcome],
+            on_result: Optional[Callable[[BlockOutcome], None]] = None,
+    ) -> List[BlockOutcome]:
+        on_result = on_result or (lambda _: None)
+        by_owner = {}
+        for outcome in outcomes:
+            owner = outcome.owner_ac if outcome.owner_ac is not None else ("floor", outcome.floor_no)
+            by_owner.setdefault(owner, []).append(outcome)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="BlockBatch") as executor:
+            for floors in executor.map(self.__block_owner, by_owner.values()):
+                for outcome in floors:
+                    on_result(outcome)
+        return outcomes
@@ -0,0 +1,79 @@
+__all__ = [
+    "PageSizeTuner",
+]
+
+import logging
+from typing import Optional
+
+logger = logging.getLogger("PageSizeTuner")
+
+
+class PageSizeTuner:
+    # Every request pays one round trip, so bigger pages are cheaper in total;
+    # the page is only kept small enough to answer within `target_latency`
+    # and to hold at most `max_payload_bytes` in memory at once.
+    def __init__(
+            self,
+            initial_size: int = 30,
+            min_size: int = 10,
+            max_size: int = 200,
+            target_latency: float = 1.0,
+            max_payload_bytes: int = 1 << 20,
+            smoothing: float = 0.3,
+    ):
+        self._min_size = max(1, min_size)
+        self._max_size = max(self._min_size, max_size)
+        self._target_latency = target_latency
+        self._max_payload_bytes = max_payload_bytes
+        self._smoothing = smoothing
+        self._page_size = self.clamp(initial_size)
+
+        self._rtt: Optional[float] = None
+        self._item_latency: Optional[float] = None
+        self._item_bytes: Optional[float] = None
+
+    @property
+    def page_size(self) -> int:
+        return self._page_size
+
+    def clamp(self, size: float) -> int:
+        return int(max(self._min_size, min(self._max_size, size)))
+
+    def __ewma(self, old: Optional[float], new: float) -> float:
+        if old is None:
+            return new
+        return old + self._smoothing * (new - old)
+
+    def aligned_page_size(self, offset: int) -> int:
+        # page_index addresses multiples of page_size, prefer a size that starts exactly at `offset`
+        if offset == 0:
+            return self._page_size
+        for size in range(self._page_size, max(self._min_size, self._page_size // 2) - 1, -1):
+            if offset % size == 0:
+                return size
+        return self._page_size
+
+    def observe(self, item_count: int, latency: float, payload_bytes: int = 0) -> int:
+        if item_count <= 0:
+            return self._page_size
+
+        self._rtt = latency if self._rtt is None else min(self._rtt, latency)
+        self._item_latency = self.__ewma(self._item_latency, max(0.0, latency - self._rtt) / item_count)
+        if payload_bytes > 0:
+            self._item_bytes = self.__ewma(self._item_bytes, payload_bytes / item_count)
+
+        candidates = [self._max_size]
+        if self._item_latency > 0:
+            candidates.append(max(0.0, self._target_latency - self._rtt) / self._item_latency)
+        if self._item_bytes:
+            candidates.append(self._max_payload_bytes / self._item_bytes)
+
+        # Grow at most twice per step, the estimates are noisy with a single sample
+        size = self.clamp(min(min(candidates), self._page_size * 2))
+        if size != self._page_size:
+            logger.debug(
+                f"Page size {self._page_size} -> {size}, "
+                f"rtt: {self._rtt:.3f}s, per item: {self._item_latency * 1000:.2f}ms"
+            )
+        self._page_size = size
+        return size
@@ -0,0 +1,180 @@
+__all__ = [
+    "AimdRateLimiter",
+    "CircuitBreaker",
+    "RetryPolicy",
+    "TokenBucket",
+]
+
+import logging
+import math
+import random
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("Resilience")
+
+
+class RetryPolicy:
+    # Full jitter exponential backoff: a sleep drawn in [0, min(max_delay, base * 2^n)],
+    # so clients shed by the same overloaded server do not come back in lockstep
+    DEFAULT_RETRIES = 3
+    DEFAULT_BASE_DELAY = 0.2
+    DEFAULT_MAX_DELAY = 5.0
+
+    def __init__(
+            self,
+            retries: int = DEFAULT_RETRIES,
+            base_delay: float = DEFAULT_BASE_DELAY,
+            max_delay: float = DEFAULT_MAX_DELAY,
+            rnd: Optional[random.Random] = None,
+    ):
+        self.retries = max(0, int(retries))
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.__random = rnd or random.Random()
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> float:
+        delay = self.__random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+        if retry_after is not None:
+            # The server said when, still capped so a bad header can not hang the caller
+            delay = max(delay, min(self.max_delay, retry_after))
+        return delay
+
+
+class CircuitBreaker:
+    # Closed: requests go through. After `failure_threshold` failures in a row it opens and
+    # requests fail at once for `reset_timeout` seconds, then a single trial request is let
+    # through (half open): its success closes the breaker, its failure opens it again.
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    DEFAULT_FAILURE_THRESHOLD = 5
+    DEFAULT_RESET_TIMEOUT = 30.0
+
+    def __init__(
+            self,
+            name: str = "",
+            failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+            reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = max(0.0, reset_timeout)
+        self.__state = self.CLOSED
+        self.__failures = 0
+        self.__opened_at = 0.0
+        self.__trial_running = False
+        self.__lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.__lock:
+            if self.__state == self.OPEN and time.monotonic() - self.__opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self.__state
+
+    def retry_after(self) -> float:
+        with self.__lock:
+            return max(0.0, self.__opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        with self.__lock:
+            if self.__state == self.CLOSED:
+                return True
+            if time.monotonic() - self.__opened_at < self.reset_timeout or self.__trial_running:
+                return False
+            self.__state = self.HALF_OPEN
+            self.__trial_running = True
+            return True
+
+    def success(self) -> None:
+        with self.__lock:
+            if self.__state != self.CLOSED:
+                logger.info(f"Circuit closed: {self.name}")
+            self.__state = self.CLOSED
+            self.__failures = 0
+            self.__trial_running = False
+
+    def failure(self) -> None:
+        with self.__lock:
+            self.__failures += 1
+            self.__trial_running = False
+            if self.__state == self.HALF_OPEN or self.__failures >= self.failure_threshold:
+                if self.__state == self.CLOSED:
+                    logger.warning(f"Circuit open for {self.reset_timeout:.0f}s: {self.name}")
+                self.__state = self.OPEN
+                self.__opened_at = time.monotonic()
+
+
+class TokenBucket:
+    # `rate` requests per second on average, up to `burst` at once after an idle spell
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self._rate = max(0.01, rate)
+        self._burst = max(1.0, burst if burst is not None else self._rate)
+        self._tokens = self._burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            # Slept outside the lock, the rate may change meanwhile and is read again
+            time.sleep(wait)
+
+
+class AimdRateLimiter(TokenBucket):
+    # Additive increase, multiplicative decrease: the rate creeps up while the server keeps
+    # up and is halved when it starts shedding, at most once per `cooldown` seconds so that
+    # the requests already in flight when it tipped over do not halve it again and again
+    DEFAULT_INCREASE = 0.1
+    DEFAULT_DECREASE = 0.5
+
+    def __init__(
+            self,
+            rate: float,
+            min_rate: float = 0.1,
+            max_rate: Optional[float] = None,
+            increase: float = DEFAULT_INCREASE,
+            decrease: float = DEFAULT_DECREASE,
+            cooldown: float = 1.0,
+    ):
+        super().__init__(rate, burst=1.0)
+        self.min_rate = max(0.01, min_rate)
+        self.max_rate = max(self._rate, max_rate if max_rate is not None else self._rate * 4)
+        self.increase = increase
+        self.decrease = min(max(decrease, 0.01), 1.0)
+        self.cooldown = cooldown
+        self.__decreased_at = -math.inf
+
+    def success(self) -> None:
+        with self._lock:
+            self._refill()
+            self._rate = min(self.max_rate, self._rate + self.increase)
+
+    def failure(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now - self.__decreased_at < self.cooldown:
+                return
+            self.__decreased_at = now
+            self._refill()
+            rate = max(self.min_rate, self._rate * self.decrease)
+            if rate != self._rate:
+                logger.warning(f"Server shedding load, rate {self._rate:.2f}/s -> {rate:.2f}/s")
+            self._rate = rate
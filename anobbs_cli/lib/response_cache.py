@@ -0,0 +1,167 @@
+__all__ = [
+    "ResponseCache",
+]
+
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+from typing import Optional, AnyStr, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import sqlite3
+
+logger = logging.getLogger("ResponseCache")
+
+
+class ResponseCache:
+    class Endpoints:
+        GROUP = "group"
+        PAGE = "page"
+
+    DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            address TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            target TEXT NOT NULL,
+            page_size INTEGER NOT NULL,
+            page_index INTEGER NOT NULL,
+            body TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            version TEXT,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            PRIMARY KEY (address, endpoint, target, page_size, page_index)
+        );
+        CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+    """
+
+    def __init__(self, path: pathlib.Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._path = path
+        self._max_bytes = max_bytes
+        self.__connection: Optional["sqlite3.Connection"] = None
+        self.__lock = threading.RLock()
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self._path
+
+    @property
+    def connection(self) -> "sqlite3.Connection":
+        with self.__lock:
+            if self.__connection is None:
+                import sqlite3
+
+                os.makedirs(self._path.parent, exist_ok=True)
+                self.__connection = sqlite3.connect(str(self._path), check_same_thread=False)
+                self.__connection.executescript(self.SCHEMA)
+            return self.__connection
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
+
+    def get(
+            self,
+            address: AnyStr,
+            endpoint: AnyStr,
+            target: AnyStr,
+            page_size: int,
+            page_index: int,
+            ttl: float,
+            ignore_ttl: bool = False,
+    ) -> Optional[dict]:
+        key = (address, endpoint, target, page_size, page_index)
+        with self.__lock:
+            row = self.connection.execute(
+                "SELECT body, stored_at FROM responses "
+                "WHERE address = ? AND endpoint = ? AND target = ? AND page_size = ? AND page_index = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            body, stored_at = row
+            now = time.time()
+            if not ignore_ttl and now - stored_at > ttl:
+                return None
+            self.connection.execute(
+                "UPDATE responses SET accessed_at = ? "
+                "WHERE address = ? AND endpoint = ? AND target = ? AND page_size = ? AND page_index = ?",
+                (now, *key),
+            )
+            self.connection.commit()
+        return json.loads(body)
+
+    def put(
+            self,
+            address: AnyStr,
+            endpoint: AnyStr,
+            target: AnyStr,
+            page_size: int,
+            page_index: int,
+            data: dict,
+            version: Optional[AnyStr] = None,
+    ) -> None:
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        now = time.time()
+        with self.__lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(address, endpoint, target, page_size, page_index, body, size, version, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (address, endpoint, target, page_size, page_index, body, len(body), version, now, now),
+            )
+            self.__evict()
+            self.connection.commit()
+
+    def invalidate(self, address: AnyStr, endpoint: AnyStr, target: Optional[AnyStr] = None) -> None:
+        with self.__lock:
+            if target is None:
+                self.connection.execute(
+                    "DELETE FROM responses WHERE address = ? AND endpoint = ?",
+                    (address, endpoint),
+                )
+            else:
+                self.connection.execute(
+                    "DELETE FROM responses WHERE address = ? AND endpoint = ? AND target = ?",
+                    (address, endpoint, target),
+                )
+            self.connection.commit()
+
+    def sync_versions(self, address: AnyStr, endpoint: AnyStr, versions: dict) -> None:
+        # Entries of unchanged targets stay valid for another ttl, changed ones are dropped
+        now = time.time()
+        with self.__lock:
+            for target, version in versions.items():
+                self.connection.execute(
+                    "DELETE FROM responses WHERE address = ? AND endpoint = ? AND target = ? AND version != ?",
+                    (address, endpoint, target, version),
+                )
+                self.connection.execute(
+                    "UPDATE responses SET stored_at = ? "
+                    "WHERE address = ? AND endpoint = ? AND target = ? AND version = ?",
+                    (now, address, endpoint, target, version),
+                )
+            self.connection.commit()
+
+    def __evict(self) -> None:
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self._max_bytes:
+            return
+        rows: List[tuple] = self.connection.execute(
+            "SELECT rowid, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        evicted = []
+        for rowid, size in rows:
+            if total <= self._max_bytes:
+                break
+            evicted.append((rowid,))
+            total -= size
+        self.connection.executemany("DELETE FROM responses WHERE rowid = ?", evicted)
+        logger.debug(f"Evicted {len(evicted)} responses")
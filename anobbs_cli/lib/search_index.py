@@ -0,0 +1,272 @@
+__all__ = [
+    "SearchIndex",
+    "ngrams",
+]
+
+import logging
+import os
+import pathlib
+import re
+import threading
+from typing import Optional, AnyStr, List, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import sqlite3
+
+logger = logging.getLogger("SearchIndex")
+
+# ASCII words stay whole, any other run of word characters (CJK, kana, hangul...) is cut into bigrams
+_RUN_PATTERN = re.compile(r"[0-9a-z]+|[^\W0-9a-z_]+")
+
+
+def _runs(text: AnyStr) -> List[AnyStr]:
+    return _RUN_PATTERN.findall(text.lower())
+
+
+def _bigrams(run: AnyStr) -> List[AnyStr]:
+    # The last character also stands alone, so a one character query has something to match
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def ngrams(text: AnyStr) -> List[AnyStr]:
+    grams = []
+    for run in _runs(text):
+        if run.isascii():
+            grams.append(run)
+        else:
+            grams.extend(_bigrams(run))
+    return grams
+
+
+def owner_token(owner_ac: Optional[AnyStr]) -> AnyStr:
+    # Stored with the grams, `_` never shows up in a gram so no text can match it
+    return "_owner_" + re.sub(r"\W|_", "", (owner_ac or "").lower())
+
+
+class SearchIndex:
+    # Inverted index over every floor the client has seen, kept in SQLite FTS5.
+    # Floors are stored as n-gram documents, ranked bm25 style, newest first on ties.
+    DEFAULT_RANK_WINDOW = 1000
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS floors (
+            rowid INTEGER PRIMARY KEY,
+            no TEXT NOT NULL UNIQUE,
+            page_id TEXT NOT NULL,
+            owner_ac TEXT,
+            create_date REAL,
+            content TEXT
+        );
+        CREATE INDEX IF NOT EXISTS floors_page_id ON floors (page_id);
+        CREATE TABLE IF NOT EXISTS page_groups (
+            page_id TEXT NOT NULL,
+            group_name TEXT NOT NULL,
+            PRIMARY KEY (page_id, group_name)
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS floor_grams USING fts5 (
+            grams,
+            tokenize = "unicode61 remove_diacritics 0 tokenchars '_'"
+        );
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self._path = path
+        self.__connection: Optional["sqlite3.Connection"] = None
+        self.__available = True
+        self.__lock = threading.RLock()
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self._path
+
+    @property
+    def connection(self) -> Optional["sqlite3.Connection"]:
+        with self.__lock:
+            if self.__connection is None and self.__available:
+                import sqlite3
+
+                os.makedirs(self._path.parent, exist_ok=True)
+                connection = sqlite3.connect(str(self._path), check_same_thread=False)
+                try:
+                    connection.execute("PRAGMA journal_mode = WAL")
+                    connection.executescript(self.SCHEMA)
+                except sqlite3.OperationalError as error:
+                    # SQLite built without FTS5, searching is off but fetching goes on
+                    logger.warning(f"Search index disabled: {error}")
+                    connection.close()
+                    self.__available = False
+                    return None
+                self.__connection = connection
+            return self.__connection
+
+    @property
+    def available(self) -> bool:
+        return self.connection is not None
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
+
+    def add_floors(self, page_id: AnyStr, floors: Iterable[dict], group_name: Optional[AnyStr] = None) -> int:
+        floors = list(floors)
+        with self.__lock:
+            if self.connection is None:
+                return 0
+            if group_name is not None:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO page_groups (page_id, group_name) VALUES (?, ?)",
+                    (page_id, group_name),
+                )
+            # Posted floors never change, known ones are skipped instead of re-tokenized
+            known = set()
+            nos = [str(floor["no"]) for floor in floors]
+            for offset in range(0, len(nos), 500):
+                batch = nos[offset:offset + 500]
+                known.update(
+                    row[0]
+                    for row
+                    in self.connection.execute(
+                        f"SELECT no FROM floors WHERE no IN ({','.join('?' * len(batch))})",
+                        batch,
+                    )
+                )
+            added = 0
+            for no, floor in zip(nos, floors):
+                if no in known:
+                    continue
+                known.add(no)
+                cursor = self.connection.execute(
+                    "INSERT INTO floors (no, page_id, owner_ac, create_date, content) VALUES (?, ?, ?, ?, ?)",
+                    (no, page_id, floor.get("owner_ac"), floor.get("create_date"), floor.get("content")),
+                )
+                self.connection.execute(
+                    "INSERT INTO floor_grams (rowid, grams) VALUES (?, ?)",
+                    (cursor.lastrowid, " ".join([owner_token(floor.get("owner_ac")), *ngrams(floor.get("content") or "")])),
+                )
+                added += 1
+            self.connection.commit()
+        return added
+
+    def add_group(self, group: dict) -> int:
+        added = 0
+        for page in group.get("pages", []):
+            first_floor = page.get("first_floor")
+            if first_floor and "no" in first_floor:
+                added += self.add_floors(
+                    page["id"],
+                    [{"owner_ac": page.get("owner_ac"), **first_floor}],
+                    group_name=group.get("name"),
+                )
+        return added
+
+    @staticmethod
+    def match_expression(query: AnyStr, owner_ac: Optional[AnyStr] = None) -> Optional[AnyStr]:
+        # Each run of the query must appear as is: a word, a one character prefix or a phrase of bigrams
+        terms = []
+        for run in _runs(query):
+            if run.isascii():
+                terms.append(f'"{run}"')
+            elif len(run) == 1:
+                terms.append(f'"{run}"*')
+            else:
+                terms.append('"' + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+        if not terms:
+            return None
+        if owner_ac is not None:
+            # Intersected inside the index, a rare anocode never scans the matches of a common term
+            terms.append(f'"{owner_token(owner_ac)}"')
+        return " AND ".join(terms)
+
+    def search(
+            self,
+            query: AnyStr,
+            owner_ac: Optional[AnyStr] = None,
+            group_name: Optional[AnyStr] = None,
+            since: Optional[float] = None,
+            until: Optional[float] = None,
+            limit: int = 20,
+            rank_window: int = DEFAULT_RANK_WINDOW,
+    ) -> List[dict]:
+        expression = self.match_expression(query, owner_ac)
+        if expression is None:
+            return []
+        # FTS5's bm25() costs tens of microseconds per match on a large index and a common
+        # term matches half the board: the newest `rank_window` matches are fetched in rowid
+        # order, which is nearly free, and ranked here by term frequency with the bm25
+        # saturation and length normalization. Every match contains every term, so the
+        # document frequency is left out.
+        sql = (
+            "SELECT floors.no, floors.page_id, floors.owner_ac, floors.create_date, floors.content "
+            "FROM floor_grams JOIN floors ON floors.rowid = floor_grams.rowid "
+            "WHERE floor_grams MATCH ?"
+        )
+        params = [expression]
+        if group_name is not None:
+            sql += " AND floors.page_id IN (SELECT page_id FROM page_groups WHERE group_name = ?)"
+            params.append(group_name)
+        if since is not None:
+            sql += " AND floors.create_date >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND floors.create_date < ?"
+            params.append(until)
+        sql += " ORDER BY floor_grams.rowid DESC LIMIT ?"
+        params.append(max(limit, rank_window))
+
+        with self.__lock:
+            if self.connection is None:
+                return []
+            rows = self.connection.execute(sql, params).fetchall()
+        if not rows:
+            return []
+
+        runs = _runs(query)
+        texts = [(content or "").lower() for *_, content in rows]
+        average_length = max(1.0, sum(map(len, texts)) / len(texts))
+        results = []
+        for (no, page_id, owner, create_date, content), text in zip(rows, texts):
+            norm = self.BM25_K1 * (1 - self.BM25_B + self.BM25_B * len(text) / average_length)
+            score = 0.0
+            for run in runs:
+                frequency = text.count(run)
+                score += frequency * (self.BM25_K1 + 1) / (frequency + norm)
+            results.append({
+                "no": no,
+                "page_id": page_id,
+                "owner_ac": owner,
+                "create_date": create_date,
+                "content": content,
+                "score": round(score, 4),
+            })
+        results.sort(key=lambda result: (-result["score"], -(result["create_date"] or 0)))
+        return results[:limit]
+
+    def owners(self, nos: Iterable[AnyStr]) -> dict:
+        # Anocode of every floor number seen so far, the unknown ones are left out
+        nos = [str(no) for no in nos]
+        owners = {}
+        with self.__lock:
+            if self.connection is None:
+                return owners
+            for offset in range(0, len(nos), 500):
+                batch = nos[offset:offset + 500]
+                owners.update(
+                    (no, owner_ac)
+                    for no, owner_ac
+                    in self.connection.execute(
+                        f"SELECT no, owner_ac FROM floors WHERE no IN ({','.join('?' * len(batch))})",
+                        batch,
+                    )
+                    if owner_ac
+                )
+        return owners
+
+    def count(self) -> int:
+        with self.__lock:
+            if self.connection is None:
+                return 0
+            return self.connection.execute("SELECT COUNT(*) FROM floors").fetchone()[0]
@@ -0,0 +1,166 @@
+__all__ = [
+    "AdaptiveInterval",
+    "BoardWatcher",
+    "ThreadWatcher",
+]
+
+import abc
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, AnyStr, List, Iterator, Callable
+
+from .anobbs_client import AnoBbsClient
+from .errors import AnoBbsError
+
+logger = logging.getLogger("Watch")
+
+
+class AdaptiveInterval:
+    # Polls quickly while something is happening and backs off geometrically while nothing is
+    DEFAULT_MIN = 2.0
+    DEFAULT_MAX = 60.0
+    DEFAULT_BACKOFF = 1.5
+
+    def __init__(self, minimum: float = DEFAULT_MIN, maximum: float = DEFAULT_MAX, backoff: float = DEFAULT_BACKOFF):
+        self.minimum = max(0.0, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.backoff = max(1.0, backoff)
+        self.__current = self.minimum
+
+    @property
+    def current(self) -> float:
+        return self.__current
+
+    def update(self, changed: bool) -> float:
+        if changed:
+            self.__current = self.minimum
+        else:
+            self.__current = min(self.maximum, max(self.__current, 0.1) * self.backoff)
+        return self.__current
+
+
+class _Watcher(abc.ABC):
+    def __init__(self, client: AnoBbsClient, interval: Optional[AdaptiveInterval] = None):
+        self._client = client
+        self.interval = interval or AdaptiveInterval()
+
+    @abc.abstractmethod
+    def poll(self) -> Iterator[List[dict]]:
+        # One pass over the server, the new items in batches
+        ...
+
+    def watch(
+            self,
+            polls: Optional[int] = None,
+            sleep: Callable[[float], None] = time.sleep,
+    ) -> Iterator[List[dict]]:
+        # Each batch is yielded as soon as it arrives, the caller renders it while the next one loads
+        count = 0
+        while polls is None or count < polls:
+            if count:
+                sleep(self.interval.current)
+            changed = False
+            try:
+                for batch in self.poll():
+                    changed = True
+                    yield batch
+            except AnoBbsError as error:
+                # The server is having a bad moment, backing off is what it needs
+                logger.warning(error)
+            self.interval.update(changed)
+            logger.debug(f"Next poll in {self.interval.current:.1f}s")
+            count += 1
+
+
+class ThreadWatcher(_Watcher):
+    # Only the floor page holding the first unseen floor is requested, plus the ones after it
+    def __init__(
+            self,
+            client: AnoBbsClient,
+            page_id: AnyStr,
+            page_size: int = AnoBbsClient.DEFAULT_FLOOR_PAGE_SIZE,
+            interval: Optional[AdaptiveInterval] = None,
+            tail: Optional[int] = None,
+    ):
+        super().__init__(client, interval)
+        self.page_id = page_id
+        self.page_size = page_size
+        self.tail = tail
+        self.known_floors = 0
+        self.floors_count: Optional[int] = None
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ThreadWatcher")
+
+    def __fetch(self, page_index: int) -> Optional[dict]:
+        return self._client.query_page_with_floor(self.page_id, self.page_size, page_index, max_age=0)
+
+    def poll(self) -> Iterator[List[dict]]:
+        first = None
+        if self.tail is not None and self.floors_count is None:
+            # Starting with the last `tail` floors, the first page only tells how many there are
+            first = self.__fetch(1)
+            if not first:
+                return
+            self.floors_count = first.get("floors_count", 0)
+            self.known_floors = max(0, self.floors_count - self.tail)
+        page_index = self.known_floors // self.page_size + 1
+        skip = self.known_floors - (page_index - 1) * self.page_size
+        pending: Optional[Future] = None
+        while True:
+            if page_index == 1 and first is not None:
+                res = first
+            elif pending is not None:
+                res = pending.result()
+            else:
+                res = self.__fetch(page_index)
+            pending = None
+            if not res:
+                return
+            self.floors_count = res.get("floors_count", 0)
+            # A full page may have a next one: it loads while this one is rendered
+            if len(res["floors"]) >= self.page_size and page_index * self.page_size < self.floors_count:
+                pending = self.__executor.submit(self.__fetch, page_index + 1)
+            floors = res["floors"][skip:]
+            skip = 0
+            if floors:
+                self.known_floors += len(floors)
+                yield floors
+            if pending is None:
+                return
+            page_index += 1
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=True)
+
+
+class BoardWatcher(_Watcher):
+    # The newest threads of a group, a thread is reported again when its floor count or update date moves
+    def __init__(
+            self,
+            client: AnoBbsClient,
+            group_name: AnyStr = "all",
+            page_size: int = AnoBbsClient.DEFAULT_GROUP_PAGE_SIZE,
+            interval: Optional[AdaptiveInterval] = None,
+    ):
+        super().__init__(client, interval)
+        self.group_name = group_name
+        self.page_size = page_size
+        self.__versions = {}
+
+    def poll(self) -> Iterator[List[dict]]:
+        res = self._client.query_group_with_pages(self.group_name, self.page_size, 1, max_age=0)
+        if not res:
+            return
+        changed = [
+            page
+            for page
+            in res["pages"]
+            if self.__versions.get(page["id"]) != (page.get("update_date"), page.get("floor_count"))
+        ]
+        for page in changed:
+            self.__versions[page["id"]] = (page.get("update_date"), page.get("floor_count"))
+        if changed:
+            yield changed
+
+    def close(self) -> None:
+        pass
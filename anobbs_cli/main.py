@@ -0,0 +1,24 @@
+__all__ = [
+    "main",
+]
+
+import sys
+
+from anobbs_cli.completion_index import fast_complete
+
+
+def main():
+    # Dynamic arguments are completed from the index without loading the client
+    if fast_complete():
+        return
+    # A running `anobbs daemon` answers with its hot client, one round trip instead of a cold start
+    from anobbs_cli.daemon import forward
+    exit_code = forward(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+    from anobbs_cli.app import cli
+    cli()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+__all__ = [
+    "OutputFormat",
+    "write_json",
+    "write_ndjson",
+    "write_tsv",
+    "write_records",
+]
+
+import json
+import sys
+from typing import AnyStr, Iterable, List, Optional, TextIO
+
+
+class OutputFormat:
+    TEXT = "text"
+    JSON = "json"
+    NDJSON = "ndjson"
+    TSV = "tsv"
+
+    ALL = [TEXT, JSON, NDJSON, TSV]
+
+
+def _lookup(record: dict, field: AnyStr):
+    # "first_floor.no" -> record["first_floor"]["no"]
+    value = record
+    for key in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _tsv_cell(value) -> AnyStr:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def write_json(document, stream: TextIO = None) -> None:
+    stream = stream or sys.stdout
+    stream.write(json.dumps(document, ensure_ascii=False, indent=2))
+    stream.write("\n")
+    stream.flush()
+
+
+def write_ndjson(records: Iterable, stream: TextIO = None) -> int:
+    # Flushed per record, a consumer sees each item as soon as it is fetched
+    stream = stream or sys.stdout
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        stream.write("\n")
+        stream.flush()
+        count += 1
+    return count
+
+
+def write_tsv(records: Iterable[dict], fields: List[AnyStr], stream: TextIO = None, header: bool = True) -> int:
+    stream = stream or sys.stdout
+    if header:
+        stream.write("\t".join(fields) + "\n")
+    count = 0
+    for record in records:
+        stream.write("\t".join(_tsv_cell(_lookup(record, field)) for field in fields) + "\n")
+        stream.flush()
+        count += 1
+    return count
+
+
+def write_records(
+        output_format: AnyStr,
+        records: Iterable[dict],
+        fields: List[AnyStr],
+        document: Optional[dict] = None,
+        stream: TextIO = None,
+        header: bool = True,
+) -> None:
+    # json prints the whole `document` (the records when there is none), the others one record per line
+    if output_format == OutputFormat.JSON:
+        write_json(document if document is not None else list(records), stream)
+    elif output_format == OutputFormat.NDJSON:
+        write_ndjson(records, stream)
+    elif output_format == OutputFormat.TSV:
+        write_tsv(records, fields, stream, header)
+    else:
+        raise ValueError(f"Not a machine readable format: {output_format}")
@@ -0,0 +1,70 @@
+"""
+Shell completion latency of `anobbs page <TAB>`, target: single-digit milliseconds.
+
+    python benchmarks/bench_completion.py [-n 200]
+"""
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anobbs_cli.completion_index import CompletionIndex, fast_complete  # noqa: E402
+
+
+def bench_in_process(index: CompletionIndex, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        with redirect_stdout(io.StringIO()):
+            assert fast_complete(index=index)
+    return (time.perf_counter() - start) / rounds
+
+
+def bench_process(rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        subprocess.run(
+            # Same code path as the `anobbs` console script, without runpy
+            [sys.executable, "-c", "from anobbs_cli.main import main; main()"],
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+    return (time.perf_counter() - start) / rounds
+
+
+def bench_interpreter(rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rounds", type=int, default=200)
+    parser.add_argument("--size", type=int, default=2000, help="Number of indexed page ids")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = CompletionIndex(index_dir)
+        index.write("page_id", [f"{i:08x}-page" for i in range(args.size)])
+        os.environ.update({
+            "_ANOBBS_COMPLETE": "complete_bash",
+            "COMP_WORDS": "anobbs page 0000",
+            "COMP_CWORD": "2",
+        })
+        in_process = bench_in_process(index, args.rounds)
+        print(f"fast_complete, in process: {in_process * 1000:.3f} ms")
+
+    process_rounds = max(1, args.rounds // 10)
+    print(f"python -c pass:             {bench_interpreter(process_rounds) * 1000:.3f} ms")
+    print(f"anobbs (console script):    {bench_process(process_rounds) * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
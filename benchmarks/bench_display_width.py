@@ -0,0 +1,93 @@
+"""
+Display width of large mixed-script threads: the imcli range table against a naive
+per-character unicodedata lookup, and the cost of width-aware rendering.
+
+    python benchmarks/bench_display_width.py [--floors 10000] [--rounds 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import unicodedata
+from typing import AnyStr, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imcli import VerticalLayout, Text  # noqa: E402
+from imcli.core import display_width  # noqa: E402
+
+SAMPLES = [
+    "AnoBBS", "hello", "world", "reply", "thread",
+    "匿名版", "讨论区", "今天天气不错", "楼主好人", "沙发",
+    "한국어", "ｆｕｌｌ", "😀", "👍", "café",
+]
+
+
+def make_lines(count: int, ascii_ratio: float, seed: int = 0) -> List[AnyStr]:
+    rnd = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        words = [
+            rnd.choice(SAMPLES[:5]) if rnd.random() < ascii_ratio else rnd.choice(SAMPLES[5:])
+            for _ in range(rnd.randint(1, 20))
+        ]
+        lines.append(" ".join(words))
+    return lines
+
+
+def naive_width(text: AnyStr) -> int:
+    width = 0
+    for char in text:
+        if unicodedata.combining(char):
+            continue
+        width += 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+    return width
+
+
+def timed(func, rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--floors", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    for ascii_ratio in (1.0, 0.5, 0.1):
+        lines = make_lines(args.floors * 4, ascii_ratio)
+        assert [naive_width(line) for line in lines] == [display_width.str_width(line) for line in lines]
+
+        naive = timed(lambda: [naive_width(line) for line in lines], args.rounds)
+
+        def uncached():
+            display_width._char_widths.clear()
+            return [display_width.str_width(line) for line in lines]
+
+        cold = timed(uncached, args.rounds)
+        warm = timed(lambda: [display_width.str_width(line) for line in lines], args.rounds)
+        print(
+            f"ascii {ascii_ratio:>4.0%}, {len(lines)} lines: "
+            f"unicodedata {naive * 1000:>7.1f} ms, "
+            f"imcli cold {cold * 1000:>7.1f} ms, "
+            f"imcli warm {warm * 1000:>7.1f} ms ({naive / warm:.1f}x)"
+        )
+
+    for ascii_ratio in (1.0, 0.1):
+        lines = make_lines(args.floors, ascii_ratio, seed=1)
+        render = timed(
+            lambda: VerticalLayout([Text(line, 64, lr_padding=0, lr_margin=4) for line in lines]).render(),
+            args.rounds,
+        )
+        print(f"render {args.floors} floors, ascii {ascii_ratio:>4.0%}: {render * 1000:>7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Cold-start latency of every `anobbs` subcommand, measured with `python -X importtime`.
+
+    python benchmarks/bench_import_time.py [-n 5] [--top 5]
+
+Each subcommand is started with `--help`, so no request is sent and no config is needed.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ENTRY = "from anobbs_cli.main import main; main()"
+
+
+def list_commands() -> List[List[str]]:
+    import click
+    from anobbs_cli.app import cli
+
+    def walk(group: click.Group, prefix: List[str]) -> List[List[str]]:
+        commands = []
+        for name, command in sorted(group.commands.items()):
+            commands.append(prefix + [name])
+            if isinstance(command, click.Group):
+                commands.extend(walk(command, prefix + [name]))
+        return commands
+
+    return [["--version"], ["--help"]] + [command + ["--help"] for command in walk(cli, [])]
+
+
+def parse_importtime(stderr: str) -> Tuple[int, Dict[str, int]]:
+    # import time: self [us] | cumulative | imported package
+    total = 0
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip(" ") for part in line.replace(":", "|", 1).split("|")]
+        total += int(self_us)
+        cumulative[name.strip()] = int(cumulative_us)
+    return total, cumulative
+
+
+def run(args: List[str]) -> Tuple[float, int, Dict[str, int]]:
+    start = time.perf_counter()
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", ENTRY] + args,
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    wall = time.perf_counter() - start
+    import_us, cumulative = parse_importtime(res.stderr)
+    return wall, import_us, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rounds", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="Show the heaviest imports of each command")
+    args = parser.parse_args()
+
+    print(f"{'command':<32} {'wall ms':>9} {'import ms':>10}")
+    for command in list_commands():
+        walls, imports, cumulative = [], [], {}
+        for _ in range(args.rounds):
+            wall, import_us, cumulative = run(command)
+            walls.append(wall * 1000)
+            imports.append(import_us / 1000)
+        print(f"{' '.join(command):<32} {statistics.median(walls):>9.1f} {statistics.median(imports):>10.1f}")
+        if args.top:
+            heaviest = sorted(
+                ((us, name) for name, us in cumulative.items() if "." not in name),
+                reverse=True,
+            )[:args.top]
+            print("    " + ", ".join(f"{name} {us / 1000:.1f}" for us, name in heaviest))
+
+
+if __name__ == '__main__':
+    main()
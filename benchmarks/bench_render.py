@@ -0,0 +1,199 @@
+"""
+Render 10k floors the way `anobbs page` does, with imcli and with the original
+string based renderer, check that both outputs are byte identical and compare the time.
+
+    python benchmarks/bench_render.py [--floors 10000] [--rounds 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import AnyStr, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imcli import VerticalLayout, HorizontalLayout, Text  # noqa: E402
+
+
+class LegacyBaseUiObject:
+    # The renderer before the line buffer core, kept verbatim as the reference
+    @classmethod
+    def add_line_border(cls, content: AnyStr) -> str:
+        content_matrix = content.split("\n")
+        max_x = max([len(line) for line in content_matrix])
+        output = ["┌" + max_x * "─" + "┐"]
+        for line in content_matrix:
+            output.append("│" + line + "│")
+        output.append("└" + max_x * "─" + "┘")
+        return "\n".join(output)
+
+    @classmethod
+    def add_blank_border(cls, content: AnyStr, border_size: int = 0) -> str:
+        content_matrix = content.split("\n")
+        output = []
+        for line in content_matrix:
+            output.append(" " * border_size + line + " " * border_size)
+        return "\n".join(output)
+
+    @classmethod
+    def render_to_rectangle(cls, content: AnyStr) -> AnyStr:
+        content_matrix = content.split("\n")
+        max_x = max([len(line) for line in content_matrix])
+        content_matrix = [
+            line + " " * (max_x - len(line))
+            for line
+            in content_matrix
+        ]
+        return "\n".join(content_matrix)
+
+    def __init__(self, content: AnyStr = "", lr_margin: int = 1, lr_padding: int = 1, use_line_border: bool = True):
+        self._content = content.replace("\t", " " * 4)
+        self._lr_margin = lr_margin
+        self._lr_padding = lr_padding
+        self._use_line_border = use_line_border
+
+    def render(self) -> AnyStr:
+        content = self.render_to_rectangle(self._content)
+        content = self.add_blank_border(content, self._lr_margin)
+        if self._use_line_border:
+            content = self.add_line_border(content)
+        content = self.add_blank_border(content, self._lr_padding)
+        return content
+
+
+class LegacyText(LegacyBaseUiObject):
+    @classmethod
+    def chunks_str(cls, lst, n) -> AnyStr:
+        lines = []
+        if n < 0:
+            return lst
+        for i in range(0, len(lst), n):
+            lines.append(lst[i:i + n])
+        return "\n".join(lines)
+
+    def __init__(self, content: AnyStr, max_lenght=32, min_lenght: int = 32, **kwargs):
+        super().__init__(**kwargs)
+        self._min_lenght = min(min_lenght, max_lenght)
+        self._max_lenght = max(max_lenght, min_lenght)
+        content = content.replace("\t", " " * 4)
+        self._content = "\n".join(
+            line + " " * max(0, self._min_lenght - len(line))
+            for line
+            in [self.chunks_str(content, self._max_lenght) for content in content.split("\n")]
+        )
+
+
+class LegacyLayout(LegacyBaseUiObject):
+    def __init__(self, sub_ui_list: List[LegacyBaseUiObject] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._use_line_border = kwargs.get("use_line_border", False)
+        self._lr_margin = kwargs.get("lr_margin", 0)
+        self._lr_padding = kwargs.get("lr_padding", 0)
+        self._sub_ui_list = sub_ui_list if sub_ui_list else []
+
+
+class LegacyVerticalLayout(LegacyLayout):
+    def render(self) -> AnyStr:
+        self._content = "\n".join(ui.render() for ui in self._sub_ui_list)
+        return super().render()
+
+
+class LegacyHorizontalLayout(LegacyLayout):
+    def render(self) -> AnyStr:
+        sub_ui_splited_matrix = [ui.render().split("\n") for ui in self._sub_ui_list]
+        max_y = max([len(ui) for ui in sub_ui_splited_matrix])
+        sub_ui_x_list = [len(ui[0]) for ui in sub_ui_splited_matrix]
+        output = []
+        for y in range(max_y):
+            line = ""
+            for x, ui_splited in enumerate(sub_ui_splited_matrix):
+                if len(ui_splited) > y:
+                    line += ui_splited[y]
+                else:
+                    line += " " * sub_ui_x_list[x]
+            output.append(line)
+        self._content = "\n".join(output)
+        return super().render()
+
+
+WORDS = ["anobbs", "floor", "reply", "thread", "hello", "world", "cli", "render", "line", "border"]
+
+
+def make_floors(count: int, seed: int = 0) -> List[dict]:
+    rnd = random.Random(seed)
+    return [
+        {
+            "no": 100000 + no,
+            "owner_ac": f"{rnd.getrandbits(32):08x}",
+            "create_date": "2021-01-01 00:00:00",
+            "content": "\n".join(
+                " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 40)))
+                for _ in range(rnd.randint(1, 4))
+            ),
+        }
+        for no
+        in range(count)
+    ]
+
+
+def floor_content(floor: dict) -> AnyStr:
+    return (
+        f"No.{floor['no']}\n"
+        f"Owner: {floor['owner_ac']}\n"
+        f"Date: {floor['create_date']}\n"
+        f"\n"
+        f"\t{floor['content']}\n"
+    )
+
+
+def render_page(floors: List[dict], text_cls, vertical_cls, horizontal_cls, use_line_border: bool) -> AnyStr:
+    body = vertical_cls([
+        text_cls(floor_content(floor), 64, lr_padding=0, lr_margin=4, use_line_border=use_line_border)
+        for floor
+        in floors
+    ])
+    side = vertical_cls([text_cls(f"{floor['no']}", 8) for floor in floors[:50]])
+    return horizontal_cls([side, body]).render()
+
+
+def bench(label: str, func, rounds: int) -> float:
+    best = min(timed(func) for _ in range(rounds))
+    print(f"{label:<24} {best * 1000:>9.1f} ms")
+    return best
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--floors", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    floors = make_floors(args.floors)
+    for use_line_border in (False, True):
+        print(f"{args.floors} floors, use_line_border={use_line_border}")
+        new = render_page(floors, Text, VerticalLayout, HorizontalLayout, use_line_border)
+        old = render_page(floors, LegacyText, LegacyVerticalLayout, LegacyHorizontalLayout, use_line_border)
+        assert new == old, "Output differs from the legacy renderer"
+
+        legacy = bench(
+            "legacy renderer",
+            lambda: render_page(floors, LegacyText, LegacyVerticalLayout, LegacyHorizontalLayout, use_line_border),
+            args.rounds,
+        )
+        current = bench(
+            "imcli",
+            lambda: render_page(floors, Text, VerticalLayout, HorizontalLayout, use_line_border),
+            args.rounds,
+        )
+        print(f"{'speed-up':<24} {legacy / current:>9.2f}x, {len(new.encode())} bytes identical\n")
+
+
+if __name__ == '__main__':
+    main()
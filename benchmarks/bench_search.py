@@ -0,0 +1,75 @@
+"""
+Query latency of the local search index on a large synthetic board, target: under 100 ms.
+
+    python benchmarks/bench_search.py [--floors 1000000] [--rounds 5]
+"""
+import argparse
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+from typing import AnyStr, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anobbs_cli.lib.search_index import SearchIndex  # noqa: E402
+
+WORDS = [
+    "anobbs", "floor", "reply", "thread", "hello", "world", "cli", "render", "python", "sqlite",
+    "匿名版", "讨论区", "今天天气不错", "楼主好人", "沙发", "板凳", "围观", "收藏", "谢谢分享", "顶",
+]
+QUERIES = ["anobbs", "sqlite python", "天气", "楼主好人", "顶", "谢谢 render", "今天天气不错 hello"]
+
+
+def make_floors(start: int, count: int, rnd: random.Random) -> List[dict]:
+    return [
+        {
+            "no": start + no,
+            "owner_ac": f"ac{rnd.randrange(1000):03d}",
+            "create_date": 1600000000 + start + no,
+            "content": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 30))),
+        }
+        for no
+        in range(count)
+    ]
+
+
+def timed(func, rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--floors", type=int, default=1000000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(pathlib.Path(tmp) / "search_index.sqlite3")
+        start = time.perf_counter()
+        for offset in range(0, args.floors, 1000):
+            index.add_floors(f"page{offset // 1000}", make_floors(offset, min(1000, args.floors - offset), rnd))
+        print(f"indexed {index.count()} floors in {time.perf_counter() - start:.1f} s")
+
+        def search(query: AnyStr, **filters):
+            return lambda: index.search(query, **filters)
+
+        for query in QUERIES:
+            best = timed(search(query), args.rounds)
+            print(f"{query!r:<24} {best * 1000:>7.1f} ms")
+        best = timed(search("天气", owner_ac="ac042"), args.rounds)
+        print(f"{'天气 owner=ac042':<24} {best * 1000:>7.1f} ms")
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
 from .base_ui_object import *
 from .layout import *
 from .text import *
+from .display_width import *
+from .render_cache import *
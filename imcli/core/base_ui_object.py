@@ -2,14 +2,16 @@ __all__ = [
     "BaseUiObject"
 ]
 
-from typing import AnyStr
+from typing import AnyStr, Iterator, List, Optional, Tuple
+
+from imcli.core.display_width import str_width
 
 
 class BaseUiObject:
     @classmethod
     def add_line_border(cls, content: AnyStr) -> str:
         content_matrix = content.split("\n")
-        max_x = max([len(line) for line in content_matrix])
+        max_x = max([str_width(line) for line in content_matrix])
         output = ["┌" + max_x * "─" + "┐"]
         for line in content_matrix:
             output.append("│" + line + "│")
@@ -28,32 +30,88 @@ class BaseUiObject:
     @classmethod
     def render_to_rectangle(cls, content: AnyStr) -> AnyStr:
         content_matrix = content.split("\n")
-        max_x = max([len(line) for line in content_matrix])
+        max_x = max([str_width(line) for line in content_matrix])
         content_matrix = [
-            line + " " * (max_x - len(line))
+            line + " " * (max_x - str_width(line))
             for line
             in content_matrix
         ]
         return "\n".join(content_matrix)
 
+    @classmethod
+    def from_lines(cls, lines: List[AnyStr], width: int) -> "BaseUiObject":
+        # Already rendered lines, all `width` columns wide, shown as they are
+        ui = cls(lr_margin=0, lr_padding=0, use_line_border=False)
+        ui.set_lines(lines, [width] * len(lines))
+        return ui
+
     def __init__(
             self, content: AnyStr = "",
             lr_margin: int = 1,
             lr_padding: int = 1,
             use_line_border: bool = True
     ):
-        self._content = content.replace("\t", " " * 4)
+        self._lines: List[AnyStr] = []
+        self._line_widths: Optional[List[int]] = None
+        self._content_width: Optional[int] = None
+        self._content = content
         self._lr_margin = lr_margin
         self._lr_padding = lr_padding
         self._use_line_border = use_line_border
 
-    def render(self) -> AnyStr:
-        content = self.render_to_rectangle(self._content)
-        content = self.add_blank_border(content, self._lr_margin)
+    @property
+    def _content(self) -> AnyStr:
+        return "\n".join(self._lines)
+
+    @_content.setter
+    def _content(self, content: AnyStr) -> None:
+        self.set_lines(content.replace("\t", " " * 4).split("\n"))
+
+    def set_lines(self, lines: List[AnyStr], line_widths: Optional[List[int]] = None) -> None:
+        self._lines = lines
+        self._line_widths = line_widths
+        self._content_width = None
+
+    def measured_lines(self) -> Iterator[Tuple[AnyStr, int]]:
+        # (line, display width) pairs, a line is never measured twice
+        if self._line_widths is None:
+            self._line_widths = [str_width(line) for line in self._lines]
+        return zip(self._lines, self._line_widths)
+
+    def content_lines(self) -> Iterator[AnyStr]:
+        return (line for line, _ in self.measured_lines())
+
+    def content_width(self) -> int:
+        if self._content_width is None:
+            self._content_width = max([width for _, width in self.measured_lines()])
+        return self._content_width
+
+    def width(self) -> int:
+        border = 2 if self._use_line_border else 0
+        return self.content_width() + 2 * self._lr_margin + border + 2 * self._lr_padding
+
+    def render_lines(self) -> Iterator[AnyStr]:
+        # The width is known before the first line, so margin, border and padding
+        # are added to every line in a single concatenation
+        content_width = self.content_width()
+        margin = " " * self._lr_margin
+        padding = " " * self._lr_padding
         if self._use_line_border:
-            content = self.add_line_border(content)
-        content = self.add_blank_border(content, self._lr_padding)
-        return content
+            horizontal = "─" * (content_width + 2 * self._lr_margin)
+            left = padding + "│" + margin
+            right = margin + "│" + padding
+            yield padding + "┌" + horizontal + "┐" + padding
+            for line, width in self.measured_lines():
+                yield left + line + " " * (content_width - width) + right
+            yield padding + "└" + horizontal + "┘" + padding
+        else:
+            left = padding + margin
+            right = margin + padding
+            for line, width in self.measured_lines():
+                yield left + line + " " * (content_width - width) + right
+
+    def render(self) -> AnyStr:
+        return "\n".join(self.render_lines())
 
     def __str__(self):
         return self.render()
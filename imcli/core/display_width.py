@@ -0,0 +1,110 @@
+__all__ = [
+    "char_width",
+    "str_width",
+    "ljust",
+    "chunks",
+]
+
+from bisect import bisect_right
+from typing import AnyStr, List
+
+from imcli.core._width_table import WIDTH_TABLE_STARTS, WIDTH_TABLE_WIDTHS
+
+
+class _CharWidths(dict):
+    # Terminal columns of one character: 0 for combining marks and format characters,
+    # 2 for East Asian wide/fullwidth characters and emoji, 1 otherwise.
+    # The range table is generated from unicodedata, see `generate_table` below;
+    # each character is looked up once and then served from the dict.
+    def __missing__(self, char: AnyStr) -> int:
+        width = WIDTH_TABLE_WIDTHS[bisect_right(WIDTH_TABLE_STARTS, ord(char)) - 1]
+        self[char] = width
+        return width
+
+
+_char_widths = _CharWidths()
+
+
+def char_width(char: AnyStr) -> int:
+    return _char_widths[char]
+
+
+def str_width(text: AnyStr) -> int:
+    if text.isascii():
+        return len(text)
+    return sum(map(_char_widths.__getitem__, text))
+
+
+def ljust(text: AnyStr, width: int) -> AnyStr:
+    return text + " " * (width - str_width(text))
+
+
+def chunks(text: AnyStr, width: int) -> List[AnyStr]:
+    # Split into pieces of at most `width` columns, a wide character never straddles two pieces
+    if width < 0 or str_width(text) <= width:
+        return [text]
+    if text.isascii():
+        return [text[i:i + width] for i in range(0, len(text), width)]
+
+    pieces = []
+    start = 0
+    used = 0
+    for index, char in enumerate(text):
+        char_columns = _char_widths[char]
+        if used + char_columns > width and index > start:
+            pieces.append(text[start:index])
+            start = index
+            used = 0
+        used += char_columns
+    pieces.append(text[start:])
+    return pieces
+
+
+def generate_table() -> AnyStr:
+    import sys
+    import unicodedata
+
+    def width_of(code_point: int) -> int:
+        char = chr(code_point)
+        category = unicodedata.category(char)
+        if category in ("Mn", "Me", "Cc") or (category == "Cf" and code_point != 0xAD):
+            return 0
+        if 0x1160 <= code_point <= 0x11FF or code_point == 0x200B:
+            return 0
+        if unicodedata.east_asian_width(char) in ("W", "F"):
+            return 2
+        return 1
+
+    starts, widths = [], []
+    for code_point in range(sys.maxunicode + 1):
+        # Unassigned code points take the width of the run they sit in, it keeps the table small
+        if unicodedata.category(chr(code_point)) == "Cn" and widths:
+            continue
+        width = width_of(code_point)
+        if not widths or widths[-1] != width:
+            starts.append(code_point)
+            widths.append(width)
+
+    def wrap(values: List[int], formatter) -> AnyStr:
+        items = [formatter(value) for value in values]
+        return "\n".join(
+            "    " + ", ".join(items[i:i + 10]) + ","
+            for i in range(0, len(items), 10)
+        )
+
+    return (
+        f"# Generated by `python -m imcli.core.display_width`, unicodedata {unicodedata.unidata_version}\n"
+        f"# Code point ranges: WIDTH_TABLE_STARTS[i] <= cp < WIDTH_TABLE_STARTS[i + 1] is WIDTH_TABLE_WIDTHS[i] wide\n"
+        f"\n"
+        f"WIDTH_TABLE_STARTS = (\n{wrap(starts, lambda value: f'0x{value:05X}')}\n)\n"
+        f"\n"
+        f"WIDTH_TABLE_WIDTHS = (\n{wrap(widths, str)}\n)\n"
+    )
+
+
+if __name__ == '__main__':
+    import os
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "_width_table.py"), "w") as file:
+        file.write(generate_table())
+    print(str_width("Hello, 世界!"), chunks("AnoBBS 匿名版讨论区", 8))
@@ -3,7 +3,8 @@ __all__ = [
     "VerticalLayout",
 ]
 
-from typing import List, AnyStr
+from itertools import zip_longest
+from typing import List, AnyStr, Iterator, Tuple
 
 from imcli.core.base_ui_object import BaseUiObject
 
@@ -24,51 +25,38 @@ class VerticalLayout(Layout):
     def __init__(self, sub_ui_list: List[BaseUiObject] = None, **kwargs):
         super().__init__(sub_ui_list, **kwargs)
 
-    def render(self) -> AnyStr:
-        self._content = "\n".join(
-            ui.render()
-            for ui
-            in self._sub_ui_list
-        )
-        return super(VerticalLayout, self).render()
+    def measured_lines(self) -> Iterator[Tuple[AnyStr, int]]:
+        if not self._sub_ui_list:
+            yield "", 0
+        for ui in self._sub_ui_list:
+            width = ui.width()
+            for line in ui.render_lines():
+                yield line, width
+
+    def content_width(self) -> int:
+        return max([ui.width() for ui in self._sub_ui_list], default=0)
 
 
 class HorizontalLayout(Layout):
     def __init__(self, sub_ui_list: List[BaseUiObject] = None, **kwargs):
         super().__init__(sub_ui_list, **kwargs)
 
-    def render(self) -> AnyStr:
-        sub_ui_matrix = [
-            ui.render()
-            for ui
-            in self._sub_ui_list
-        ]
-        max_y = max([
-            len(ui.split("\n"))
-            for ui
-            in sub_ui_matrix
-        ])
-        sub_ui_splited_matrix = [
-            ui_matrix.split("\n")
-            for ui_matrix
-            in sub_ui_matrix
-        ]
-        sub_ui_x_list = [
-            len(ui_splited_matrix[0])
-            for ui_splited_matrix
-            in sub_ui_splited_matrix
-        ]
-        output = []
-        for y in range(max_y):
-            line = ""
-            for x, ui_splited in enumerate(sub_ui_splited_matrix):
-                if len(ui_splited) > y:
-                    line += ui_splited[y]
-                else:
-                    line += " " * sub_ui_x_list[x]
-            output.append(line)
-        self._content = "\n".join(output)
-        return super(HorizontalLayout, self).render()
+    def measured_lines(self) -> Iterator[Tuple[AnyStr, int]]:
+        if not self._sub_ui_list:
+            yield "", 0
+            return
+        widths = [ui.width() for ui in self._sub_ui_list]
+        blanks = [" " * width for width in widths]
+        width = sum(widths)
+        for row in zip_longest(*[ui.render_lines() for ui in self._sub_ui_list]):
+            yield "".join([
+                blanks[x] if line is None else line
+                for x, line
+                in enumerate(row)
+            ]), width
+
+    def content_width(self) -> int:
+        return sum(ui.width() for ui in self._sub_ui_list)
 
 
 if __name__ == '__main__':
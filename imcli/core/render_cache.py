@@ -0,0 +1,124 @@
+__all__ = [
+    "RenderCache",
+]
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import AnyStr, Callable, Iterable, List, Optional, Tuple
+
+from imcli.core.base_ui_object import BaseUiObject
+
+RenderedLines = Tuple[List[AnyStr], int]
+
+
+class RenderCache:
+    # Rendered lines of immutable ui objects, keyed by everything that changes their look:
+    # an in-process LRU in front of an optional SQLite file shared between runs
+    DEFAULT_MAX_SIZE = 4096
+    DEFAULT_DISK_MAX_SIZE = 100000
+
+    def __init__(
+            self,
+            max_size: int = DEFAULT_MAX_SIZE,
+            path: Optional[AnyStr] = None,
+            disk_max_size: int = DEFAULT_DISK_MAX_SIZE,
+    ):
+        self._max_size = max_size
+        self._path = path
+        self._disk_max_size = disk_max_size
+        self.__memory: "OrderedDict[AnyStr, RenderedLines]" = OrderedDict()
+        self.__connection = None
+        self.__lock = threading.RLock()
+        self.__pending: List[tuple] = []
+        # Keys a preload found missing on disk, `get` doesn't ask the file again
+        self.__absent = set()
+
+    @staticmethod
+    def make_key(*parts) -> AnyStr:
+        return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    @property
+    def connection(self):
+        if self._path is None:
+            return None
+        if self.__connection is None:
+            import sqlite3
+
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            self.__connection = sqlite3.connect(self._path, check_same_thread=False)
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS rendered (key TEXT PRIMARY KEY, lines TEXT NOT NULL, width INTEGER NOT NULL)"
+            )
+        return self.__connection
+
+    def __remember(self, key: AnyStr, rendered: RenderedLines) -> None:
+        self.__memory[key] = rendered
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self._max_size:
+            self.__memory.popitem(last=False)
+
+    def preload(self, keys: Iterable[AnyStr]) -> None:
+        # One query for a whole page instead of one per floor
+        with self.__lock:
+            missing = [key for key in keys if key not in self.__memory and key not in self.__absent]
+            if not missing or self.connection is None:
+                return
+            for offset in range(0, len(missing), 500):
+                batch = missing[offset:offset + 500]
+                rows = self.connection.execute(
+                    f"SELECT key, lines, width FROM rendered WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, lines, width in rows:
+                    self.__remember(key, (json.loads(lines), width))
+                self.__absent.update(set(batch).difference(key for key, _, _ in rows))
+
+    def get(self, key: AnyStr) -> Optional[BaseUiObject]:
+        with self.__lock:
+            rendered = self.__memory.get(key)
+            if rendered is None:
+                self.preload([key])
+                rendered = self.__memory.get(key)
+            if rendered is None:
+                return None
+            self.__memory.move_to_end(key)
+        return BaseUiObject.from_lines(*rendered)
+
+    def render(self, key: AnyStr, factory: Callable[[], BaseUiObject]) -> BaseUiObject:
+        ui = self.get(key)
+        if ui is not None:
+            return ui
+        ui = factory()
+        rendered = (list(ui.render_lines()), ui.width())
+        with self.__lock:
+            self.__remember(key, rendered)
+            self.__absent.discard(key)
+            if self._path is not None:
+                self.__pending.append((key, json.dumps(rendered[0], ensure_ascii=False), rendered[1]))
+        return BaseUiObject.from_lines(*rendered)
+
+    def flush(self) -> None:
+        with self.__lock:
+            if not self.__pending or self.connection is None:
+                return
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO rendered (key, lines, width) VALUES (?, ?, ?)",
+                self.__pending,
+            )
+            # Rowids grow with every write, the oldest renders go first
+            self.connection.execute(
+                "DELETE FROM rendered WHERE rowid <= (SELECT MAX(rowid) FROM rendered) - ?",
+                (self._disk_max_size,),
+            )
+            self.connection.commit()
+            self.__pending.clear()
+
+    def close(self) -> None:
+        with self.__lock:
+            self.flush()
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
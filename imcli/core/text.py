@@ -1,17 +1,13 @@
 from typing import AnyStr
 
 from imcli.core.base_ui_object import BaseUiObject
+from imcli.core.display_width import str_width, chunks
 
 
 class Text(BaseUiObject):
     @classmethod
     def chunks_str(cls, lst, n) -> AnyStr:
-        lines = []
-        if n < 0:
-            return lst
-        for i in range(0, len(lst), n):
-            lines.append(lst[i:i + n])
-        return "\n".join(lines)
+        return "\n".join(chunks(lst, n))
 
     def __init__(self, content: AnyStr, max_lenght=32, min_lenght: int = 32, **kwargs):
         super().__init__(**kwargs)
@@ -20,16 +16,20 @@ class Text(BaseUiObject):
         self.set_content(content)
 
     def set_content(self, content: AnyStr) -> bool:
-        content = content.replace("\t", " " * 4)
-
-        self._content = "\n".join(
-            line + " " * max(0, self._min_lenght - len(line))
-            for line
-            in [
-                self.chunks_str(content, self._max_lenght)
-                for content
-                in content.split("\n")
-            ])
+        # Wrap, pad and measure every line in one pass
+        max_lenght = self._max_lenght
+        min_lenght = self._min_lenght
+        lines = []
+        line_widths = []
+        for line in content.replace("\t", " " * 4).split("\n"):
+            for chunk in chunks(line, max_lenght):
+                width = str_width(chunk)
+                if width < min_lenght:
+                    chunk += " " * (min_lenght - width)
+                    width = min_lenght
+                lines.append(chunk)
+                line_widths.append(width)
+        self.set_lines(lines, line_widths)
         return True
 
 
@@ -18,7 +18,7 @@ setup(
     ],
     entry_points={
         "console_scripts": [
-            f'anobbs=anobbs_cli.app:cli'
+            'anobbs=anobbs_cli.main:main'
         ],
     },
 )